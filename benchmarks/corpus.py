@@ -0,0 +1,165 @@
+import os
+import random
+import argparse
+
+from pypdf import PdfWriter
+
+# Synthetic upload folders for benchmarks: N courses with M PDFs each (syllabus, midterm overview, lecture
+# slides, a textbook with a chapter outline), with varying page counts. Page content is written by hand
+# (uncompressed text streams), so generating a 1,000-file folder is quick; pypdf only adds the bookmarks.
+
+SUBJECTS = {
+    "PHYS": ["quantum", "states", "operators", "spin", "hydrogen", "entanglement", "measurement"],
+    "MATH": ["integrals", "series", "convergence", "vectors", "matrices", "eigenvalues", "limits"],
+    "HLTH": ["biostatistics", "epidemiology", "sampling", "regression", "cohort", "prevalence"],
+    "HIST": ["revolution", "empire", "treaty", "industrial", "cold", "colonial", "reform"],
+    "SYSD": ["stocks", "flows", "feedback", "delays", "equilibrium", "simulation", "loops"],
+    "BIOL": ["cells", "genetics", "mitosis", "enzymes", "evolution", "membranes", "proteins"],
+    "CS": ["loops", "recursion", "algorithms", "pointers", "graphs", "hashing", "sorting"],
+    "ECON": ["markets", "elasticity", "inflation", "monopoly", "demand", "supply", "equilibrium"],
+}
+
+LINES_PER_PAGE = 40
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+# Minimal single-font PDF: one uncompressed content stream per page, xref table with exact offsets.
+# outline is an optional list of (title, page_index) bookmarks.
+def write_pdf(path, pages, outline=None):
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        body = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{n} 0 R" for n in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+    if outline:
+        writer = PdfWriter(clone_from=path)
+        for title, page in outline:
+            writer.add_outline_item(title, page)
+        writer.write(path)
+
+
+def _filler_pages(rng, words, title, page_count):
+    pages = []
+    for page in range(page_count):
+        lines = [f"{title} - page {page + 1}"]
+        for _ in range(LINES_PER_PAGE - 1):
+            lines.append(" ".join(rng.choice(words) for _ in range(12)))
+        pages.append(lines)
+    return pages
+
+
+def _syllabus_pages(code, topic_words, chapters, exam_date):
+    lines = [
+        f"{code} - {', '.join(w.title() for w in topic_words[:3])}",
+        "Course Outline and Syllabus",
+        f"Course: {code}",
+        f"Final Exam: {exam_date}",
+        "",
+        "Schedule of Topics",
+    ]
+    for n in range(1, chapters + 1):
+        lines.append(f"Week {n}: Chapter {n} - {topic_words[n % len(topic_words)].title()}")
+    lines += ["", "Grading: Assignments 30%, Midterm 30%, Final 40%"]
+    return [lines]
+
+
+def _midterm_pages(code, topic_words, cutoff, exam_date):
+    lines = [f"{code} Midterm Overview", f"Date: {exam_date}", "", "Coverage:"]
+    for n in range(1, cutoff + 1):
+        lines.append(f"Chapter {n} - {topic_words[n % len(topic_words)].title()}")
+    lines.append(f"Material after Chapter {cutoff} is NOT on the midterm.")
+    return [lines]
+
+
+def _courses(n_courses):
+    subjects = list(SUBJECTS)
+    courses = []
+    for i in range(n_courses):
+        subject = subjects[i % len(subjects)]
+        courses.append((f"{subject} {101 + (37 * i) % 399}", SUBJECTS[subject]))
+    return courses
+
+
+# Writes the folder and returns the list of generated paths
+def generate_corpus(out_dir, n_courses, files_per_course, min_pages=2, max_pages=40, textbook_pages=120, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+
+    for index, (code, words) in enumerate(_courses(n_courses)):
+        chapters = rng.randint(6, 12)
+        exam_date = f"December {rng.randint(5, 20)}, 2026"
+        documents = [
+            (f"{code} Syllabus.pdf", _syllabus_pages(code, words, chapters, exam_date), None),
+            (f"Midterm Overview {index + 1}.pdf", _midterm_pages(code, words, chapters // 2, exam_date), None),
+        ]
+        if files_per_course > 2:
+            title = f"{words[0].title()} and {words[1].title()}: A Textbook"
+            chapter_length = max(1, textbook_pages // chapters)
+            outline = [
+                (f"Chapter {n + 1}: {words[(n + 1) % len(words)].title()}", n * chapter_length)
+                for n in range(chapters) if n * chapter_length < textbook_pages
+            ]
+            documents.append((f"{words[0].title()} Textbook {index + 1}.pdf",
+                              _filler_pages(rng, words, title, textbook_pages), outline))
+        for lecture in range(max(0, files_per_course - len(documents))):
+            title = f"Lecture {lecture + 1}: {rng.choice(words).title()}"
+            documents.append(
+                (f"{words[lecture % len(words)].title()} Lecture {index + 1}-{lecture + 1}.pdf",
+                 _filler_pages(rng, words, title, rng.randint(min_pages, max_pages)), None)
+            )
+
+        for name, pages, outline in documents[:files_per_course]:
+            path = os.path.join(out_dir, name)
+            write_pdf(path, pages, outline)
+            paths.append(path)
+    return paths
+
+
+# 10 files -> 2 courses x 5, 100 -> 10 x 10, 1000 -> 40 x 25
+def corpus_shape(n_files):
+    n_courses = min(40, max(2, n_files // 10))
+    return n_courses, max(2, n_files // n_courses)
+
+
+# Usage: python -m benchmarks.corpus OUT_DIR --files 100
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic upload folder.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    n_courses, per_course = corpus_shape(args.files)
+    paths = generate_corpus(args.out_dir, n_courses, per_course, seed=args.seed)
+    print(f"📂 Wrote {len(paths)} PDFs for {n_courses} courses to '{args.out_dir}'.")
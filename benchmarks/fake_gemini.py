@@ -0,0 +1,182 @@
+import re
+import json
+import time
+import random
+import datetime
+import threading
+
+# Local stand-in for google.generativeai.GenerativeModel, so the planner can be benchmarked without API quota.
+# It recognises each agent's prompt and answers with templated JSON built from the prompt itself, after a
+# configurable latency. A fraction of calls can fail with a 429 or come back truncated, to exercise the
+# retry / fallback paths the way a busy Gemini endpoint would.
+
+COURSE_CODE_PATTERN = re.compile(r"\b([A-Z]{2,5}) ?(\d{3}[A-Z]?)\b")
+FILE_HEADER_PATTERN = re.compile(r"--- FILE(?: \d+)?: (.+?) ---\n(.*?)(?=\n--- FILE|\Z)", re.DOTALL)
+RANGE_PATTERN = re.compile(r"PLANNING RANGE: (\d{4}-\d{2}-\d{2}) to (\d{4}-\d{2}-\d{2})")
+TASK_PATTERN = re.compile(r"^\s*- (.+?) \(Need: ([\d.]+)h\)", re.MULTILINE)
+
+
+class FakeUsage:
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(prompt) // 4 + 1
+        self.candidates_token_count = len(text) // 4 + 1
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, prompt, text):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt, text)
+
+
+class FakeRateLimitError(Exception):
+    pass
+
+
+class FakeGeminiModel:
+    """Answers like Gemini would for the four planner agents. Thread-safe; counts calls per prompt kind."""
+
+    model_name = "models/fake-gemini"
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_rate=0.0, truncate_rate=0.0, retry_after=0.5, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.truncate_rate = truncate_rate
+        self.retry_after = retry_after
+        self.calls = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        kind = prompt_kind(prompt)
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            rate_limited = self._random.random() < self.rate_limit_rate
+            truncated = self._random.random() < self.truncate_rate
+
+        time.sleep(delay)
+        if rate_limited:
+            raise FakeRateLimitError(
+                f"429 Resource has been exhausted (e.g. check quota). Please retry in {self.retry_after}s."
+            )
+
+        text = RESPONDERS[kind](prompt)
+        if truncated:
+            text = text[:max(1, len(text) // 2)]
+        return FakeResponse(prompt, text)
+
+
+def prompt_kind(prompt):
+    if "You are an Academic File Organizer" in prompt:
+        return "discover"
+    if "Match EVERY document below" in prompt:
+        return "classify_batch"
+    if "Match the document below" in prompt:
+        return "classify"
+    if "Academic Difficulty Analyst" in prompt:
+        return "analyze"
+    if "Time-Blocking Scheduler" in prompt:
+        return "schedule"
+    if "Audit & Compliance" in prompt:
+        return "audit"
+    return "other"
+
+
+def _known_courses(prompt):
+    start = prompt.find("{", prompt.find("KNOWN COURSES"))
+    try:
+        courses, _ = json.JSONDecoder().raw_decode(prompt[start:])
+        return courses
+    except ValueError:
+        return {}
+
+
+# Picks the known course whose code (or topic words) shows up most in the text
+def _best_course(text, courses):
+    if not courses:
+        return "General_Items"
+    squashed = text.replace(" ", "").upper()
+    for code in courses:
+        if code.replace(" ", "").upper() in squashed:
+            return code
+    lowered = text.lower()
+    scores = {
+        code: sum(lowered.count(word) for word in re.findall(r"[a-z]{4,}", topic.lower()))
+        for code, topic in courses.items()
+    }
+    return max(scores, key=scores.get)
+
+
+def _discover(prompt):
+    files_section = prompt.split("FILES CONTENT:", 1)[-1]
+    found = {}
+    for subject, number in COURSE_CODE_PATTERN.findall(files_section):
+        code = f"{subject} {number}"
+        if code not in found:
+            topic_match = re.search(re.escape(code) + r"\s*[-:]\s*([^\n]+)", files_section)
+            found[code] = topic_match.group(1).strip()[:80] if topic_match else "General topics"
+    return json.dumps(found)
+
+
+def _classify_batch(prompt):
+    courses = _known_courses(prompt)
+    files_section = prompt.split("FILES TO SORT:", 1)[-1]
+    result = {name.strip(): _best_course(body, courses) for name, body in FILE_HEADER_PATTERN.findall(files_section)}
+    return json.dumps(result)
+
+
+def _classify(prompt):
+    courses = _known_courses(prompt)
+    snippet = prompt.split("NEW FILE TO SORT:", 1)[-1]
+    return _best_course(snippet, courses)
+
+
+def _analyze(prompt):
+    course = re.search(r"CURRENT COURSE: (.+)", prompt)
+    course = course.group(1).strip() if course else "Course"
+    chapters = sorted(set(int(n) for n in re.findall(r"Chapter (\d+)", prompt)))[:8] or [1, 2, 3]
+    topics = [
+        {"topic": f"{course} Chapter {n}", "est_hours": 2.0 + (n % 3), "high_focus": n % 2 == 1}
+        for n in chapters
+    ]
+    return json.dumps({"topics": topics})
+
+
+def _schedule(prompt):
+    match = RANGE_PATTERN.search(prompt)
+    if not match:
+        return json.dumps({"schedule": []})
+    start, end = (datetime.datetime.strptime(d, "%Y-%m-%d").date() for d in match.groups())
+    tasks = [name for name, _ in TASK_PATTERN.findall(prompt.split("TASKS TO SCHEDULE:", 1)[-1])] or ["Review"]
+
+    days = []
+    task_index = 0
+    current = start
+    while current <= end:
+        events = [{"time": "07:00 - 08:00", "task": "Morning Routine", "type": "personal"}]
+        for slot in ("08:00 - 10:00", "10:15 - 12:00", "13:00 - 15:00", "15:15 - 17:00", "19:00 - 21:00"):
+            events.append({"time": slot, "task": tasks[task_index % len(tasks)], "type": "study"})
+            task_index += 1
+        events.insert(3, {"time": "12:00 - 13:00", "task": "LUNCH", "type": "meal"})
+        events.insert(6, {"time": "18:00 - 19:00", "task": "DINNER", "type": "meal"})
+        events.append({"time": "23:00", "task": "SLEEP", "type": "personal"})
+        days.append({"date": current.strftime("%Y-%m-%d"), "day_name": current.strftime("%A"), "events": events})
+        current += datetime.timedelta(days=1)
+    return json.dumps({"schedule": days})
+
+
+def _audit(prompt):
+    return json.dumps({"valid": True, "feedback": "Approved. The plan covers all courses and respects user constraints."})
+
+
+RESPONDERS = {
+    "discover": _discover,
+    "classify_batch": _classify_batch,
+    "classify": _classify,
+    "analyze": _analyze,
+    "schedule": _schedule,
+    "audit": _audit,
+    "other": lambda prompt: "{}",
+}
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import resource
+import tempfile
+import subprocess
+
+from .corpus import generate_corpus, corpus_shape
+
+# End-to-end planner benchmark against the local fake Gemini backend (no API quota needed).
+# Every (size, entry point) pair runs in its own subprocess, with its own cache directory, so peak RSS and
+# cold-cache timings aren't polluted by the previous run.
+#
+# Usage: python -m benchmarks.run_benchmarks --sizes 10 100 1000 [--latency 0.3] [--rate-limit-rate 0.05]
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+ENTRY_POINTS = ["team", "adk"]
+STAGES = ["agent1.sort", "agent2.analyze", "agent3_4.loop", "render"]
+
+
+def _install_fake_model(args):
+    from planner_agent import llm_client
+    from .fake_gemini import FakeGeminiModel
+
+    model = FakeGeminiModel(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_rate=args.rate_limit_rate,
+        truncate_rate=args.truncate_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    llm_client.set_model_override("all", model)
+    return model
+
+
+def _run_team(args, start_date, end_date):
+    import main
+
+    team = main.StudyAgentTeam()
+    team.state.user_constraints = args.constraints
+    team.state.start_date = start_date
+    team.state.end_date = end_date
+    team.run()
+
+
+# The ADK entry point records into a trace of its own run, so it's handed the benchmark's trace to fill
+def _run_adk(args, start_date, end_date):
+    from planner_agent import agent, tracing
+
+    agent.FILES_DIR = os.path.join(args.workdir, "uploaded_files")
+    agent.OUTPUT_DIR = args.workdir
+    agent.run_study_planner(None, args.constraints, end_date, trace=tracing.current())
+
+
+# Runs one entry point in THIS process and writes the measurements to args.result
+def run_child(args):
+    os.chdir(args.workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    from planner_agent import tracing
+    model = _install_fake_model(args)
+
+    start = datetime.date.today()
+    start_date = start.strftime("%Y-%m-%d")
+    end_date = (start + datetime.timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+
+    result = {"entry": args.entry, "files": len(os.listdir("uploaded_files"))}
+    began = time.perf_counter()
+    try:
+        if args.entry == "team":
+            _run_team(args, start_date, end_date)
+        else:
+            _run_adk(args, start_date, end_date)
+    except ImportError as e:
+        result["skipped"] = str(e)
+    result["wall_s"] = time.perf_counter() - began
+
+    spans, counters = tracing.snapshot()
+    stage_times = {}
+    for s in spans:
+        if s["name"] in STAGES or s["name"] in ("llm.generate", "pdf.extract"):
+            stage_times[s["name"]] = stage_times.get(s["name"], 0.0) + s["duration"]
+    result["stages"] = stage_times
+    # An empty table would mean the run's spans went to a trace nobody read
+    if "skipped" not in result and not any(s in stage_times for s in STAGES):
+        result["error"] = "no stage timings recorded (the run's trace was not captured)"
+    result["counters"] = counters
+    result["fake_calls"] = model.calls
+    # ru_maxrss is in KB on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    tracing.write_trace(os.path.join(args.workdir, f"trace_{args.entry}.json"))
+
+    with open(args.result, "w") as f:
+        json.dump(result, f, indent=2)
+
+
+def _child_command(args, entry, workdir, result_path):
+    return [
+        sys.executable, "-m", "benchmarks.run_benchmarks", "--child",
+        "--entry", entry, "--workdir", workdir, "--result", result_path,
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--rate-limit-rate", str(args.rate_limit_rate), "--truncate-rate", str(args.truncate_rate),
+        "--retry-after", str(args.retry_after), "--seed", str(args.seed),
+        "--days", str(args.days), "--constraints", args.constraints,
+    ]
+
+
+def run_size(args, n_files, root):
+    n_courses, per_course = corpus_shape(n_files)
+    corpus_dir = os.path.join(root, f"corpus_{n_files}")
+    print(f"📂 Generating {n_courses} courses x {per_course} PDFs...")
+    generate_corpus(corpus_dir, n_courses, per_course, max_pages=args.max_pages, seed=args.seed)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["GEMINI_REQUESTS_PER_SECOND"] = str(args.rps)
+    env["GEMINI_BURST"] = str(max(1, int(args.rps)))
+    if args.engine:
+        env["PLANNER_SCHEDULER_ENGINE"] = args.engine
+
+    results = []
+    for entry in args.entries:
+        workdir = os.path.join(root, f"run_{n_files}_{entry}")
+        shutil.copytree(corpus_dir, os.path.join(workdir, "uploaded_files"))
+        env["PLANNER_CACHE_DIR"] = os.path.join(workdir, ".planner_cache")
+        result_path = os.path.join(workdir, "result.json")
+
+        passes = ["cold", "warm"] if args.warm else ["cold"]
+        for cache_state in passes:
+            print(f"⏱️  {n_files} files / {entry} / {cache_state} cache...")
+            with open(os.path.join(workdir, f"{cache_state}.log"), "w") as log:
+                subprocess.run(_child_command(args, entry, workdir, result_path), cwd=REPO_ROOT, env=env,
+                               stdout=log, stderr=subprocess.STDOUT, check=False)
+            try:
+                with open(result_path) as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                result = {"entry": entry, "error": f"run failed, see {workdir}/{cache_state}.log"}
+            result.update({"size": n_files, "cache": cache_state})
+            results.append(result)
+            if os.path.exists(result_path):
+                os.remove(result_path)
+    return results
+
+
+def format_results(results):
+    header = f"{'FILES':>6} {'ENTRY':<6} {'CACHE':<6} {'WALL s':>8} " + " ".join(f"{s:>14}" for s in STAGES)
+    header += f" {'LLM CALLS':>10} {'PEAK MB':>8}"
+    lines = [header]
+    for r in results:
+        if "error" in r or "skipped" in r:
+            lines.append(f"{r['size']:>6} {r['entry']:<6} {r['cache']:<6} {r.get('error') or 'skipped: ' + r['skipped']}")
+            continue
+        llm_calls = sum(v for k, v in r["counters"].items() if k.startswith("llm.calls."))
+        stages = " ".join(f"{r['stages'].get(s, 0.0):>14.3f}" for s in STAGES)
+        lines.append(
+            f"{r['size']:>6} {r['entry']:<6} {r['cache']:<6} {r['wall_s']:>8.2f} {stages} "
+            f"{llm_calls:>10} {r['peak_rss_mb']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the planner end to end with a fake Gemini backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Upload folder sizes (files).")
+    parser.add_argument("--entries", nargs="+", default=ENTRY_POINTS, choices=ENTRY_POINTS)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per call, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency per call, up to this many seconds.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls that fail with a 429.")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of responses cut off halfway.")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry hint (seconds) sent with injected 429s.")
+    parser.add_argument("--rps", type=float, default=50, help="Planner rate limit during the benchmark.")
+    parser.add_argument("--engine", choices=["local", "llm"], help="Agent 3 engine (default: PLANNER_SCHEDULER_ENGINE).")
+    parser.add_argument("--days", type=int, default=14, help="Planning horizon in days.")
+    parser.add_argument("--constraints", default="No Sundays", help="User constraints given to the planner.")
+    parser.add_argument("--max-pages", type=int, default=40, help="Max pages per lecture deck.")
+    parser.add_argument("--warm", action="store_true", help="Also re-run each case with warm caches.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the generated folders and logs.")
+    parser.add_argument("--out", help="Also write the raw results as JSON to this path.")
+    # Internal: run a single case in this process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--entry", default="team", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    root = tempfile.mkdtemp(prefix="planner_bench_")
+    results = []
+    try:
+        for n_files in args.sizes:
+            results.extend(run_size(args, n_files, root))
+    finally:
+        if args.keep:
+            print(f"   (run folders kept in '{root}')")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print("\n📊 Benchmark Results:")
+    print(format_results(results))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,58 @@
 import os
-import json
 import datetime
 import time
-from dataclasses import dataclass, field
-from typing import List, Dict, Any
+import argparse
 
 # --- IMPORT AGENT SKILLS ---
-from agent1_sorter import sort_files, extract_header_text
-from agent2_ranking import analyze_course
-from agent3_scheduler import generate_schedule
-from agent4_confirming import audit_schedule
+from planner_agent.agent1_sorter import sort_files
+from planner_agent.agent2_ranking import analyze_courses, read_course_documents, course_context
+from planner_agent.agent3_scheduler import generate_schedule, repair_schedule
+from planner_agent.agent4_confirming import audit_schedule
+from planner_agent.tracing import span, enable_profiling, finish_run, reset as reset_trace, TRACE_FILE
+from planner_agent.pipeline import IncrementalPlanner, watch_directory
+from planner_agent.render import render_plan
+from planner_agent.state import (
+    PlannerState, save_checkpoint, load_checkpoint, clear_checkpoint, upload_digests, CHECKPOINT_FILE,
+    STAGE_SORT, STAGE_ANALYZE, STAGE_SCHEDULE, STAGE_RENDER
+)
 
 # --- CONFIGURATION ---
 UPLOAD_DIR = "uploaded_files"
-OUTPUT_FILE = "final_study_plan.md"
+OUTPUT_BASE = "final_study_plan"
+OUTPUT_FILE = f"{OUTPUT_BASE}.md"
 MAX_RETRIES = 3
-
-@dataclass
-class PlannerState:
-    """Represents the shared memory/state of the Agent Team."""
-    user_hints: str = None
-    user_constraints: str = "None"
-    start_date: str = None
-    end_date: str = None
-    course_files: Dict = field(default_factory=dict)
-    course_analysis: List[Dict] = field(default_factory=list)
-    draft_schedule: Dict = field(default_factory=dict)
-    feedback_history: List[str] = field(default_factory=list)
+STAGES = [STAGE_SORT, STAGE_ANALYZE, STAGE_SCHEDULE, STAGE_RENDER]
 
 class StudyAgentTeam:
-    def __init__(self):
+    def __init__(self, resume=False, checkpoint_path=None):
         self.state = PlannerState()
+        self.checkpoint_path = checkpoint_path or CHECKPOINT_FILE
+        self.resumed = False
         self.setup_environment()
+        self.state.pdf_files = sorted(self.pdf_files)
+        self.state.pdf_digests = upload_digests(self.state.pdf_files)
+        if resume:
+            self.resume_from_checkpoint()
+
+    def resume_from_checkpoint(self):
+        """Picks up the state saved by an earlier run (same uploads), skipping the stages it already finished."""
+        saved = load_checkpoint(self.checkpoint_path)
+        if saved is None:
+            print(f"⚠️  No checkpoint found at '{self.checkpoint_path}'. Starting a fresh run.")
+            return
+        if saved.pdf_files != self.state.pdf_files or saved.pdf_digests != self.state.pdf_digests:
+            print(f"⚠️  '{UPLOAD_DIR}' changed since the checkpoint was written. Starting a fresh run.")
+            return
+
+        self.state = saved
+        self.resumed = True
+        done = ", ".join(saved.completed_stages) or "none"
+        print(f"♻️  Resuming from '{self.checkpoint_path}' (completed stages: {done}; Agent 3/4 attempts: {saved.attempt}).")
+
+    # checkpoint_path None (watch mode) = no checkpoints
+    def checkpoint(self):
+        if self.checkpoint_path:
+            save_checkpoint(self.state, self.checkpoint_path)
 
     def setup_environment(self):
         print("\n===========================================")
@@ -87,71 +108,81 @@ class StudyAgentTeam:
         # Context string for relative difficulty scaling
         course_list_str = ", ".join([c for c in self.state.course_files.keys() if c != "General_Items"])
         
+        # Read every course's files in one multi-core pass (textbooks as outline chapter tables)
+        texts = read_course_documents(self.state.course_files)
+
+        course_contexts = []
         for course_name, file_paths in self.state.course_files.items():
             if course_name == "General_Items": continue
             
             print(f"  -> Analying: {course_name}...")
             
-            # Build context from files
-            structured_context = ""
-            for path in file_paths:
-                fname = os.path.basename(path)
-                text = extract_header_text(path)
-                structured_context += f"\n\n=== DOC: {fname} ===\n{text}\n=== END DOC ===\n"
-
-            # Execute Skill
-            analysis = analyze_course(
-                course_name, 
-                structured_context, 
-                course_list_str, 
-                self.state.user_constraints
-            )
-            
-            self.state.course_analysis.append({
-                "course": course_name,
-                "analysis": analysis
-            })
+            # Build context from files (exam guides and syllabi first, packed under the token budget)
+            course_contexts.append((course_name, course_context(file_paths, texts)))
+
+        # Execute Skill (all courses at once, sharing one rate limiter)
+        self.state.course_analysis = analyze_courses(
+            course_contexts, 
+            course_list_str, 
+            self.state.user_constraints,
+            course_files=self.state.course_files
+        )
 
     def run_agent_loop_scheduler_auditor(self):
         """The Feedback Loop: Agent 3 (Architect) <-> Agent 4 (Auditor)"""
         print(f"\n🗓️  AGENT TEAM: Collaborative Planning ({self.state.start_date} to {self.state.end_date})...")
         
-        attempt = 1
-        is_valid = False
-        current_constraints = self.state.user_constraints
-        final_feedback = ""
+        # A resumed run continues after the last finished iteration instead of redrafting from scratch
+        attempt = self.state.attempt + 1
+        is_valid = self.state.is_valid
+        final_feedback = self.state.feedback()
 
         while attempt <= MAX_RETRIES and not is_valid:
-            print(f"\n   🔄 Iteration {attempt}/{MAX_RETRIES}...")
+            with span("agent3_4.iteration", attempt=attempt):
+                print(f"\n   🔄 Iteration {attempt}/{MAX_RETRIES}...")
             
-            # --- AGENT 3: SCHEDULER ---
-            print("      [Agent 3] Drafting schedule...")
-            self.state.draft_schedule = generate_schedule(
-                self.state.course_analysis, 
-                self.state.start_date, 
-                self.state.end_date, 
-                current_constraints
-            )
-
-            # --- AGENT 4: AUDITOR ---
-            print("      [Agent 4] Reviewing draft against requirements...")
-            is_valid, feedback = audit_schedule(
-                self.state.draft_schedule, 
-                self.state.user_constraints, # Check against original user rules
-                self.state.course_analysis   # Check against original workload requirements
-            )
+                # --- AGENT 3: SCHEDULER ---
+                if attempt == 1:
+                    print("      [Agent 3] Drafting schedule...")
+                    self.state.draft_schedule = generate_schedule(
+                        self.state.course_analysis, 
+                        self.state.start_date, 
+                        self.state.end_date, 
+                        self.state.user_constraints
+                    )
+                else:
+                    # Keep the approved days, re-solve only what the auditor flagged
+                    print("      [Agent 3] Repairing flagged days/courses...")
+                    self.state.draft_schedule = repair_schedule(
+                        self.state.draft_schedule,
+                        final_feedback,
+                        self.state.course_analysis,
+                        self.state.start_date,
+                        self.state.end_date,
+                        self.state.user_constraints
+                    )
+
+                # --- AGENT 4: AUDITOR ---
+                print("      [Agent 4] Reviewing draft against requirements...")
+                is_valid, feedback = audit_schedule(
+                    self.state.draft_schedule, 
+                    self.state.user_constraints, # Check against original user rules
+                    self.state.course_analysis   # Check against original workload requirements
+                )
             
-            final_feedback = feedback
-            self.state.feedback_history.append(f"Attempt {attempt}: {feedback}")
-
-            if not is_valid:
-                print(f"      ⚠️  REJECTED: {feedback}")
-                print("      🔧  Agent 4 is instructing Agent 3 to fix issues...")
-                # Update constraints with specific correction instructions
-                current_constraints += f" [CORRECTION REQUIRED: {feedback}]"
-                attempt += 1
-            else:
-                print("      ✅ APPROVED.")
+                final_feedback = feedback
+                self.state.feedback_history.append(f"Attempt {attempt}: {feedback}")
+                self.state.attempt = attempt
+                self.state.is_valid = is_valid
+                self.state.record_feedback(feedback)
+                self.checkpoint()
+
+                if not is_valid:
+                    print(f"      ⚠️  REJECTED: {feedback}")
+                    print("      🔧  Agent 4 is instructing Agent 3 to fix issues...")
+                    attempt += 1
+                else:
+                    print("      ✅ APPROVED.")
 
         return final_feedback
 
@@ -159,54 +190,89 @@ class StudyAgentTeam:
         """Final Output Generation"""
         print("\n💾 System: Saving artifacts...")
         
-        # Save JSON
-        with open("final_study_plan.json", "w") as f:
-            json.dump(self.state.draft_schedule, f, indent=2)
-            
-        # Save Markdown
-        self._generate_markdown(audit_report)
-        print(f"✅ Mission Complete. Plan saved to '{OUTPUT_FILE}'.")
-
-    def _generate_markdown(self, audit_report):
-        """Internal helper to render Markdown"""
-        with open(OUTPUT_FILE, "w") as f:
-            f.write("# 📅 Final Exam Study Plan\n\n")
-            
-            # Auditor Status Header
-            f.write("### 🛡️ Auditor Report (Agent 4)\n")
-            status_icon = "✅" if "approved" in audit_report.lower() else "⚠️"
-            f.write(f"> {status_icon} **STATUS:** {audit_report}\n\n---\n")
-
-            if not self.state.draft_schedule.get("schedule"):
-                f.write("No schedule generated.")
-                return
-
-            for day_entry in self.state.draft_schedule["schedule"]:
-                date = day_entry.get("date", "Unknown")
-                day_name = day_entry.get("day_name", "")
-                
-                f.write(f"## {day_name}, {date}\n")
-                f.write("| Time | Type | Task |\n| :--- | :--- | :--- |\n")
-                
-                for event in day_entry.get("events", []):
-                    t_time = event.get("time", "")
-                    t_task = event.get("task", "")
-                    t_type = event.get("type", "").upper()
-                    
-                    icon = "📚"
-                    if "BREAK" in t_type: icon = "☕"
-                    elif "MEAL" in t_type: icon = "🍽️"
-                    elif "PERSONAL" in t_type or "WAKE" in t_type: icon = "🛌"
-                    elif "REVIEW" in t_type: icon = "🧠"
-                    
-                    f.write(f"| **{t_time}** | {icon} {t_type} | {t_task} |\n")
-                f.write("\n---\n\n")
+        # Markdown, JSON, calendar and CSV in one streaming pass over the days
+        paths = render_plan(self.state.draft_schedule, audit_report, OUTPUT_BASE)
+        print(f"✅ Mission Complete. Plan saved to '{paths.get('md', OUTPUT_FILE)}'.")
+        extras = [p for fmt, p in paths.items() if fmt != "md"]
+        if extras:
+            print(f"   Also written: {', '.join(extras)}")
+
+    def run(self):
+        """Runs Agents 1-4 and the render step, each as a traced stage, checkpointing after every stage."""
+        stages = [
+            (STAGE_SORT, self.run_agent_1_sorter),
+            (STAGE_ANALYZE, self.run_agent_2_analyst),
+            (STAGE_SCHEDULE, self.run_agent_loop_scheduler_auditor),
+        ]
+        for name, stage in stages:
+            if self.state.is_done(name):
+                print(f"\n⏭️  Skipping {name} (restored from checkpoint).")
+                continue
+            with span(name):
+                stage()
+            self.state.mark_done(name)
+            self.checkpoint()
+
+        with span(STAGE_RENDER):
+            self.save_artifacts(self.state.last_feedback)
+        # Finished runs have nothing to resume
+        clear_checkpoint(self.checkpoint_path)
+        return self.state.last_feedback
+
+    def run_watch(self, trace_path=None):
+        """Watch mode: re-plans whenever uploaded_files changes, recomputing only what the change affects."""
+        # Every pass is memoised by the pipeline itself; a checkpoint of a watch pass would only be picked up,
+        # stale, by a later --resume
+        self.checkpoint_path = None
+        def schedule(course_files, course_analysis):
+            self.state.course_files = course_files
+            self.state.course_analysis = course_analysis
+            self.state.feedback_history = []
+            self.state.attempt = 0
+            self.state.is_valid = False
+            with span("agent3_4.loop"):
+                report = self.run_agent_loop_scheduler_auditor()
+            return self.state.draft_schedule, report
+
+        def render(schedule, report):
+            self.state.draft_schedule = schedule
+            with span("render"):
+                self.save_artifacts(report)
+
+        planner = IncrementalPlanner(UPLOAD_DIR, schedule, render, self.state.user_hints)
+
+        # One failed pass (a corrupt PDF, Gemini down, a full disk) is reported and the next change retries;
+        # it must not end the daemon
+        def on_change():
+            reset_trace()
+            try:
+                planner.run(self.state.user_constraints, self.state.start_date, self.state.end_date)
+            except Exception as e:
+                print(f"❌ Re-planning failed ({type(e).__name__}: {e}). Still watching; the next change will retry.")
+            finally:
+                finish_run(trace_path)
+
+        watch_directory(UPLOAD_DIR, on_change)
 
 # --- ENTRY POINT ---
 if __name__ == "__main__":
-    system = StudyAgentTeam()
-    system.get_user_context()
-    system.run_agent_1_sorter()
-    system.run_agent_2_analyst()
-    final_report = system.run_agent_loop_scheduler_auditor()
-    system.save_artifacts(final_report)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Final.AI - Exam Study Planner")
+    parser.add_argument("--profile", action="append", default=[], choices=STAGES,
+                        help="Wrap a pipeline stage in cProfile (repeatable).")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Where to write the JSON trace of this run.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last interrupted run from its checkpoint instead of starting over.")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="Where the run's checkpoint is kept.")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-plan whenever uploaded_files changes (only affected courses are redone).")
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+
+    system = StudyAgentTeam(resume=args.resume, checkpoint_path=args.checkpoint)
+    if not system.resumed:
+        system.get_user_context()
+    if args.watch:
+        system.run_watch(args.trace)
+    else:
+        system.run()
+        finish_run(args.trace)
\ No newline at end of file
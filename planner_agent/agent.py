@@ -1,178 +1,358 @@
 import os
-import json
-import re
+import uuid
+import asyncio
 import datetime
+from typing import AsyncIterator, AsyncGenerator
 from google.adk.agents import Agent
+from google.adk.tools import ToolContext
 
 # Import skills
-from .agent1_sorter import sort_files, extract_header_text
-from .agent2_ranking import analyze_course
-from .agent3_scheduler import generate_schedule
+from .agent1_sorter import sort_files
+from .agent2_ranking import analyze_courses, read_course_documents, course_context
+from .agent3_scheduler import generate_schedule, repair_schedule
 from .agent4_confirming import audit_schedule
+from .tracing import span, trace_context, finish_run
+from .render import render_plan
+from .pdf_reader import get_document_features
+from .doc_features import latest_exam_date
+from .progress import (
+    ProgressReporter, PlannerCancelled, EVENT_STARTED, EVENT_STAGE, EVENT_FILES_SORTED, EVENT_FILES_READ,
+    EVENT_COURSE_ANALYZED, EVENT_DAY_DRAFTED, EVENT_ATTEMPT_AUDITED, EVENT_PLAN_SAVED, EVENT_DONE, EVENT_CANCELLED,
+    EVENT_ERROR
+)
+from .state import (
+    PlannerState, save_checkpoint, load_checkpoint, clear_checkpoint, upload_digests, CHECKPOINT_FILE,
+    STAGE_SORT, STAGE_ANALYZE, STAGE_SCHEDULE, STAGE_RENDER
+)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+FILES_DIR = os.path.join(REPO_ROOT, 'uploaded_files')
+OUTPUT_DIR = REPO_ROOT
+
+# ADK sessions each get their own checkpoint, plan files and trace under planner_sessions/<run id>/, so
+# concurrent sessions don't overwrite each other and resume=True picks up this session's run.
+# The run id is kept in the ADK session state.
+SESSIONS_DIRNAME = "planner_sessions"
+SESSION_STATE_KEY = "planner_run_id"
+
+
+def session_output_dir(tool_context=None):
+    if tool_context is None:
+        return OUTPUT_DIR
+    run_id = tool_context.state.get(SESSION_STATE_KEY)
+    if not run_id:
+        run_id = uuid.uuid4().hex[:12]
+        tool_context.state[SESSION_STATE_KEY] = run_id
+    return os.path.join(OUTPUT_DIR, SESSIONS_DIRNAME, run_id)
 
-# Scans text for exam dates
-def parse_dates_from_text(text, current_year):
-    date_patterns = [
-        r"Date:\s*([A-Za-z]+ \d{1,2}, \d{4})",  # Explicit Date with Year
-        r"Date:\s*([A-Za-z]+ \d{1,2})",         # Date without Year
-        r"Exam:\s*([A-Za-z]+ \d{1,2}, \d{4})"   # Exam Label
-    ]
-    
-    found_dates = []
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                # Handle "Month DD, YYYY"
-                if "," in match:
-                    dt = datetime.datetime.strptime(match, "%B %d, %Y").date()
-                else:
-                    # Handle "Month DD" (Assume current year)
-                    dt = datetime.datetime.strptime(f"{match}, {current_year}", "%B %d, %Y").date()
-                found_dates.append(dt)
-            except:
-                pass
-                
-    if found_dates:
-        return max(found_dates)
-    return None
 
 # The function that runs the study planner
-def run_study_planner_tool(user_hints: str, user_constraints: str, end_date: str) -> str:
+def run_study_planner_tool(user_hints: str, user_constraints: str, end_date: str, resume: bool = False) -> str:
+    return run_study_planner(user_hints, user_constraints, end_date, resume)
+
+
+# The whole workflow, shared by the sync and async tools. progress (a ProgressReporter) receives structured
+# events and can cancel the run at its next safe point, which raises PlannerCancelled.
+# output_dir holds the run's checkpoint, plan files and trace (default OUTPUT_DIR). Spans and counters go to
+# a trace of this run only: a new one, or trace (a tracing.Trace) when the caller wants to read it afterwards.
+def run_study_planner(user_hints, user_constraints, end_date, resume=False, progress=None, output_dir=None,
+                      trace=None):
+    with trace_context(trace):
+        return _run_study_planner(user_hints, user_constraints, end_date, resume, progress, output_dir or OUTPUT_DIR)
+
+
+def _run_study_planner(user_hints, user_constraints, end_date, resume, progress, output_dir):
+    progress = progress or ProgressReporter()
     print("\n🚀 [ADK] Starting Planner Workflow...")
     
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    repo_root = os.path.abspath(os.path.join(current_dir, '..'))
-    files_dir = os.path.join(repo_root, 'uploaded_files')
-    output_md_path = os.path.join(repo_root, 'final_study_plan.md')
-    output_json_path = os.path.join(repo_root, 'final_study_plan.json')
+    files_dir = FILES_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    output_base = os.path.join(output_dir, 'final_study_plan')
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
 
     if not os.path.exists(files_dir):
         return f"Error: '{files_dir}' not found."
 
-    pdf_files = [os.path.join(files_dir, f) for f in os.listdir(files_dir) if f.lower().endswith('.pdf')]
+    pdf_files = sorted(os.path.join(files_dir, f) for f in os.listdir(files_dir) if f.lower().endswith('.pdf'))
     if not pdf_files:
         return f"Error: No PDFs found in {files_dir}."
 
     print(f"📂 Found {len(pdf_files)} PDFs. Proceeding...")
+    progress.event(EVENT_STARTED, files=len(pdf_files))
 
-    # Fixes date
-    today = datetime.date.today()
-    current_year = today.year
-    start_date = today.strftime("%Y-%m-%d")
-    is_valid = False
-    
-    # Track the target date object for comparison later
-    target_date = None
+    # Same state model (and checkpoint format) as main.py, so an interrupted run can be resumed
+    state = None
+    pdf_digests = upload_digests(pdf_files)
+    if resume:
+        state = load_checkpoint(checkpoint_path)
+        if state is None or state.pdf_files != pdf_files or state.pdf_digests != pdf_digests:
+            print("   ⚠️  No usable checkpoint for these files. Starting a fresh run.")
+            state = None
+        else:
+            print(f"   ♻️  Resuming (completed stages: {', '.join(state.completed_stages) or 'none'}).")
 
-    if end_date:
-        try:
-            s = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-            e = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-            if e > s: 
-                is_valid = True
-                target_date = e.date()
-        except: pass
-
-    if not is_valid:
-        target_date = today + datetime.timedelta(days=14)
-        end_date = target_date.strftime("%Y-%m-%d")
-        print(f"   🗓️  Date Auto-Fix: Defaulting to 14-day plan ({end_date})")
-    else:
-        print(f"   🗓️  Planning Horizon: {start_date} to {end_date}")
+    if state is None:
+        state = PlannerState(
+            user_hints=user_hints, user_constraints=user_constraints, pdf_files=pdf_files, pdf_digests=pdf_digests
+        )
+
+        # Fixes date
+        today = datetime.date.today()
+        state.start_date = today.strftime("%Y-%m-%d")
+        is_valid = False
+
+        if end_date:
+            try:
+                s = datetime.datetime.strptime(state.start_date, "%Y-%m-%d")
+                e = datetime.datetime.strptime(end_date, "%Y-%m-%d")
+                if e > s: 
+                    is_valid = True
+            except: pass
+
+        if not is_valid:
+            end_date = (today + datetime.timedelta(days=14)).strftime("%Y-%m-%d")
+            print(f"   🗓️  Date Auto-Fix: Defaulting to 14-day plan ({end_date})")
+        else:
+            print(f"   🗓️  Planning Horizon: {state.start_date} to {end_date}")
+        state.end_date = end_date
 
     # Agents
 
     # Agent 1: Sorter
-    print("   🔍 Agent 1: Scanning & Sorting files...")
-    sorted_courses = sort_files(pdf_files, user_hints)
-    if not sorted_courses: return "Failed to sort files."
+    if not state.is_done(STAGE_SORT):
+        progress.check()
+        progress.event(EVENT_STAGE, stage=STAGE_SORT)
+        print("   🔍 Agent 1: Scanning & Sorting files...")
+        with span(STAGE_SORT):
+            state.course_files = sort_files(state.pdf_files, state.user_hints)
+        if not state.course_files: return "Failed to sort files."
+        state.mark_done(STAGE_SORT)
+        save_checkpoint(state, checkpoint_path)
+        progress.event(
+            EVENT_FILES_SORTED,
+            files=sum(len(paths) for paths in state.course_files.values()),
+            courses=sorted(state.course_files)
+        )
 
     # Agent 2: Analyst
-    print("   🧠 Agent 2: Analyzing Course Difficulty...")
-    all_course_data = []
-    course_list_str = ", ".join([c for c in sorted_courses.keys() if c != "General_Items"])
+    if not state.is_done(STAGE_ANALYZE):
+        progress.check()
+        progress.event(EVENT_STAGE, stage=STAGE_ANALYZE)
+        print("   🧠 Agent 2: Analyzing Course Difficulty...")
+        sorted_courses = state.course_files
+        course_list_str = ", ".join([c for c in sorted_courses.keys() if c != "General_Items"])
+        current_year = datetime.date.today().year
     
-    # Progress Counter
-    total_courses = len([c for c in sorted_courses if c != "General_Items"])
-    count = 1
+        # Progress Counter
+        total_courses = len([c for c in sorted_courses if c != "General_Items"])
+        count = 1
     
-    latest_exam_date = None # Track the latest exam found
+        latest_exam = None # Track the latest exam found
     
-    for course_name, file_paths in sorted_courses.items():
-        if course_name == "General_Items": continue
+        with span(STAGE_ANALYZE):
+            # Read every course's files in one multi-core pass (textbooks as outline chapter tables)
+            texts = read_course_documents(sorted_courses)
+            progress.event(EVENT_FILES_READ, files=len(texts))
+
+            course_contexts = []
+            for course_name, file_paths in sorted_courses.items():
+                if course_name == "General_Items": continue
         
-        print(f"      [{count}/{total_courses}] Reading {course_name}...", end="", flush=True)
+                print(f"      [{count}/{total_courses}] Reading {course_name}...", end="", flush=True)
         
-        structured_context = ""
-        for path in file_paths:
-            raw_text = extract_header_text(path) 
-            structured_context += f"\n=== {os.path.basename(path)} ===\n{raw_text}\n"
-
-            # Date scanning logic
-            found = parse_dates_from_text(raw_text, current_year)
-            if found:
-                if latest_exam_date is None or found > latest_exam_date:
-                    latest_exam_date = found
-
-        difficulty = analyze_course(course_name, structured_context, course_list_str, user_constraints)
-        all_course_data.append({"course": course_name, "analysis": difficulty})
-        print(" Done.")
-        count += 1
-
-    # --- NEW: Auto-Extend Schedule if Exam Found ---
-    if latest_exam_date and latest_exam_date > target_date:
-        print(f"\n   ⚠️  Auto-Extending Schedule to cover Exam on {latest_exam_date}!")
-        target_date = latest_exam_date
-        end_date = target_date.strftime("%Y-%m-%d") # Update string for scheduler
+                # Exam dates were picked up while the PDFs were read (see doc_features)
+                found = latest_exam_date([get_document_features(p) for p in file_paths], current_year)
+                if found and (latest_exam is None or found > latest_exam):
+                    latest_exam = found
+
+                # Exam guides and syllabi first, packed under the token budget
+                course_contexts.append((course_name, course_context(file_paths, texts)))
+                print(" Done.")
+                count += 1
+
+            # Analyze all courses concurrently (wall time ~ the slowest course instead of the sum)
+            print(f"      Analyzing {total_courses} courses in parallel...")
+            state.course_analysis = analyze_courses(
+                course_contexts, course_list_str, state.user_constraints, course_files=sorted_courses,
+                progress=progress
+            )
+
+        # --- NEW: Auto-Extend Schedule if Exam Found ---
+        target_date = datetime.datetime.strptime(state.end_date, "%Y-%m-%d").date()
+        if latest_exam and latest_exam > target_date:
+            print(f"\n   ⚠️  Auto-Extending Schedule to cover Exam on {latest_exam}!")
+            state.end_date = latest_exam.strftime("%Y-%m-%d") # Update string for scheduler
+
+        state.mark_done(STAGE_ANALYZE)
+        save_checkpoint(state, checkpoint_path)
         
-    print(f"   🎯 Final Planning Range: {start_date} to {end_date}")
+    print(f"   🎯 Final Planning Range: {state.start_date} to {state.end_date}")
 
     # Agent 3 and 4 feedback look
+    progress.event(EVENT_STAGE, stage=STAGE_SCHEDULE)
     print("   🗓️  Agent 3 & 4: Generating Schedule...")
     max_retries = 3
-    attempt = 1
-    is_valid = False
-    current_constraints = user_constraints
-    final_schedule = {}
-    feedback = "Initial Run"
+    attempt = state.attempt + 1
+    is_valid = state.is_valid
+    feedback = state.feedback() if state.attempt else "Initial Run"
 
     while attempt <= max_retries and not is_valid:
-        print(f"      Attempt {attempt}/{max_retries}: Drafting...", end="", flush=True)
-        final_schedule = generate_schedule(all_course_data, start_date, end_date, current_constraints)
+        progress.check()
+        with span("agent3_4.iteration", attempt=attempt):
+            if attempt == 1:
+                print(f"      Attempt {attempt}/{max_retries}: Drafting...", end="", flush=True)
+                state.draft_schedule = generate_schedule(
+                    state.course_analysis, state.start_date, state.end_date, state.user_constraints,
+                    progress=progress
+                )
+            else:
+                # Keep the approved days, re-solve only what the auditor flagged
+                print(f"      Attempt {attempt}/{max_retries}: Repairing...", end="", flush=True)
+                state.draft_schedule = repair_schedule(
+                    state.draft_schedule, feedback, state.course_analysis,
+                    state.start_date, state.end_date, state.user_constraints, progress=progress
+                )
         
-        print(" Auditing...", end="", flush=True)
-        is_valid, feedback = audit_schedule(final_schedule, current_constraints, all_course_data)
+            print(" Auditing...", end="", flush=True)
+            is_valid, feedback = audit_schedule(state.draft_schedule, state.user_constraints, state.course_analysis)
+
+            state.feedback_history.append(f"Attempt {attempt}: {feedback}")
+            state.attempt = attempt
+            state.is_valid = is_valid
+            state.record_feedback(feedback)
+            save_checkpoint(state, checkpoint_path)
+            progress.event(EVENT_ATTEMPT_AUDITED, attempt=attempt, approved=is_valid, feedback=str(feedback))
         
-        if not is_valid:
-            print(f" ❌ Rejected.")
-            current_constraints += f" [CORRECTION: {feedback}]"
-            attempt += 1
-        else:
-            print(f" ✅ Approved!")
+            if not is_valid:
+                print(f" ❌ Rejected.")
+                attempt += 1
+            else:
+                print(f" ✅ Approved!")
+    state.mark_done(STAGE_SCHEDULE)
+    save_checkpoint(state, checkpoint_path)
 
-    # Output
-    markdown_output = f"# 📅 Final Exam Study Plan\n\n### 🛡️ Auditor Report: {feedback}\n\n---\n"
-    
-    if final_schedule.get("schedule"):
-        for day in final_schedule["schedule"]:
-            markdown_output += f"## {day.get('day_name')}, {day.get('date')}\n"
-            markdown_output += "| Time | Task |\n| :--- | :--- |\n"
-            for e in day.get("events", []):
-                markdown_output += f"| **{e.get('time')}** | {e.get('task')} |\n"
-            markdown_output += "\n---\n"
-
-    # Save to Disk
-    with open(output_md_path, "w") as f: f.write(markdown_output)
-    with open(output_json_path, "w") as f: json.dump(final_schedule, f, indent=2)
+    # Output (Markdown, JSON, calendar and CSV in one streaming pass over the days)
+    with span(STAGE_RENDER):
+        paths = render_plan(state.draft_schedule, feedback, output_base)
+    progress.event(EVENT_PLAN_SAVED, paths=paths)
+    output_md_path = paths.get("md")
+    if output_md_path:
+        with open(output_md_path, "r", encoding="utf-8") as f: markdown_output = f.read()
+    else:
+        output_md_path = ", ".join(paths.values())
+        markdown_output = f"Plan saved to: {output_md_path}\n\nAuditor Report: {feedback}"
 
+    # Finished runs have nothing to resume
+    clear_checkpoint(checkpoint_path)
     print(f"\n✅ DONE! Saved to: {output_md_path}")
+    finish_run(os.path.join(output_dir, 'planner_trace.json'))
     return markdown_output
 
+
+# Async, progress-streaming version: the pipeline runs in a worker thread (its LLM calls, PDF pool and rate
+# limiter stay as they are), so the event loop - and every other session on an ADK server - is never blocked.
+# Yields progress event dicts as they happen, ending with {"event": "done", "plan": markdown}.
+# Cancelling the consuming task (or closing the generator) stops the run at its next safe point;
+# its checkpoint is kept, so resume=True continues from there.
+async def stream_study_planner(user_hints: str, user_constraints: str, end_date: str,
+                               resume: bool = False, output_dir: str = None) -> AsyncIterator[dict]:
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    progress = ProgressReporter(lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+    run = asyncio.ensure_future(
+        asyncio.to_thread(run_study_planner, user_hints, user_constraints, end_date, resume, progress, output_dir)
+    )
+    run.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        try:
+            plan = run.result()
+        except PlannerCancelled:
+            yield progress.event(EVENT_CANCELLED)
+            return
+        except Exception as e:
+            yield progress.event(EVENT_ERROR, message=str(e))
+            return
+        yield progress.event(EVENT_DONE, plan=plan)
+    finally:
+        if not run.done():
+            # The worker thread can't be killed; it stops at its next check() and leaves its checkpoint behind
+            progress.cancel()
+            run.add_done_callback(lambda finished: finished.cancelled() or finished.exception())
+            print("\n🛑 [ADK] Planner run cancelled. Resume it with resume=True.")
+
+
+STAGE_MESSAGES = {
+    STAGE_SORT: "🔍 Agent 1: Scanning & Sorting files...",
+    STAGE_ANALYZE: "🧠 Agent 2: Analyzing Course Difficulty...",
+    STAGE_SCHEDULE: "🗓️  Agent 3 & 4: Generating Schedule...",
+}
+
+
+# One chat line per progress event; the "done" event becomes the plan itself
+def describe_event(event):
+    kind = event["event"]
+    if kind == EVENT_STARTED:
+        return f"📂 Found {event['files']} PDFs. Proceeding..."
+    if kind == EVENT_STAGE:
+        return STAGE_MESSAGES.get(event["stage"], event["stage"])
+    if kind == EVENT_FILES_SORTED:
+        return f"📚 Sorted {event['files']} files into: {', '.join(event['courses'])}"
+    if kind == EVENT_FILES_READ:
+        return f"📖 Read {event['files']} documents."
+    if kind == EVENT_COURSE_ANALYZED:
+        return f"[{event['done']}/{event['total']}] Analyzed {event['course']}"
+    if kind == EVENT_DAY_DRAFTED:
+        return f"🗓️  Drafted {event['date']} ({len(event['day'].get('events', []))} blocks)"
+    if kind == EVENT_ATTEMPT_AUDITED:
+        return f"Attempt {event['attempt']}: {'✅' if event['approved'] else '❌'} {event['feedback']}"
+    if kind == EVENT_PLAN_SAVED:
+        return f"💾 Plan saved to: {event['paths'].get('md') or ', '.join(event['paths'].values())}"
+    if kind == EVENT_DONE:
+        return event["plan"]
+    if kind == EVENT_CANCELLED:
+        return "🛑 Planner run cancelled. Call again with resume=True to continue from the last checkpoint."
+    if kind == EVENT_ERROR:
+        return f"Error: {event['message']}"
+    return str(event)
+
+
+# Streaming tool (async generator) for live_agent: every progress event reaches the chat as it happens, ending
+# with the plan. ADK only iterates streaming tools under run_live. Runs in this session's own directory.
+async def run_study_planner_tool_streaming(user_hints: str, user_constraints: str, end_date: str,
+                                           resume: bool = False,
+                                           tool_context: ToolContext = None) -> AsyncGenerator[str, None]:
+    output_dir = session_output_dir(tool_context)
+    async for event in stream_study_planner(user_hints, user_constraints, end_date, resume, output_dir):
+        yield describe_event(event)
+
+
+# The root agent's tool (adk run / adk web): waits for the run without blocking the event loop, returns the plan
+async def run_study_planner_tool_async(user_hints: str, user_constraints: str, end_date: str,
+                                       resume: bool = False, tool_context: ToolContext = None) -> str:
+    output_dir = session_output_dir(tool_context)
+    async for event in stream_study_planner(user_hints, user_constraints, end_date, resume, output_dir):
+        if event["event"] in (EVENT_DONE, EVENT_CANCELLED, EVENT_ERROR):
+            return describe_event(event)
+    return "Error: the planner stopped without producing a plan."
+
 # --- AGENT DEFINITION ---
 root_agent = Agent(
     name="study_planner_agent",
     model="gemini-2.0-flash", 
     description="Study Planner Tool",
-    tools=[run_study_planner_tool] 
+    tools=[run_study_planner_tool_async] 
+)
+
+# Live-mode (run_live) variant of the same agent, which streams each progress step to the chat
+live_agent = Agent(
+    name="study_planner_live_agent",
+    model="gemini-2.0-flash-live-001",
+    description="Study Planner Tool (live, streams progress)",
+    tools=[run_study_planner_tool_streaming]
 )
\ No newline at end of file
@@ -1,37 +1,145 @@
 import os
-import google.generativeai as genai
 import json
-from pypdf import PdfReader
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+from .pdf_reader import extract_text, get_document_features, HEADER_PAGES
+from .extract_pool import extract_many
+from .llm_cache import cached_generate_content
+from .llm_client import get_model
+from .tracing import span, propagate
+from .context_packer import estimate_tokens
+from .doc_features import DOC_SYLLABUS, DOC_EXAM_GUIDE
+from .local_classifier import classify_snippets, available as local_classifier_available
 
-# Using Gemini 3.0 Flash
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-3-flash-preview")  
+# How many files are matched to courses at once (1 = the old one-at-a-time behaviour)
+SORTER_MAX_WORKERS = int(os.getenv("SORTER_MAX_WORKERS", "8"))
+
+# Batched classification: pack several unmatched files into one prompt instead of one prompt per file
+SORTER_BATCH_MODE = os.getenv("SORTER_BATCH_MODE", "1") != "0"
+SORTER_BATCH_TOKEN_BUDGET = int(os.getenv("SORTER_BATCH_TOKEN_BUDGET", "30000"))
+BATCH_SNIPPET_CHARS = 4000
+
+# Character budgets: syllabus discovery only looks at a file's header, course matching needs a longer snippet
+DISCOVERY_CHAR_BUDGET = 2000
+ASSIGN_CHAR_BUDGET = 10000
 
 # Reads the first 4 pages of the pdf (or all the pages in the pdf) in an attempt to find the course code or title
-def extract_header_text(pdf_path):
-    try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for i in range(min(4, len(reader.pages))):
-            text += reader.pages[i].extract_text()
-        return text
-    except Exception as e:
-        print(f"Error reading {pdf_path}: {e}")
-        return ""
+# Pages are read lazily and cached on disk, and reading stops once char_budget characters are collected
+def extract_header_text(pdf_path, char_budget=None, max_pages=HEADER_PAGES):
+    return extract_text(pdf_path, char_budget, max_pages)
+
+
+# Returns at least 'budget' characters of the file (if it has them), reading further pages only when needed
+def _snippet(data, budget):
+    if len(data['text']) < budget and not data.get('complete'):
+        data['text'] = extract_header_text(data['path'], budget)
+        data['complete'] = len(data['text']) < budget
+    return data['text'][:budget]
+
+
+# Reads the longer snippets of several files up front through the extraction pool (multi-core, with timeouts),
+# so the _snippet calls made from the LLM worker threads are served from memory
+def _prefetch_snippets(entries, budget):
+    needed = [data for data in entries if len(data['text']) < budget and not data.get('complete')]
+    texts = extract_many([(data['path'], budget, HEADER_PAGES) for data in needed])
+    for data, text in zip(needed, texts):
+        if len(text) > len(data['text']):
+            data['text'] = text
+        data['complete'] = len(data['text']) < budget
+
+# Syllabus discovery is map-reduce so it scales past one prompt: the documents most likely to name the courses
+# (syllabi, outlines, exam guides, and a couple of files per course code they mention) are picked locally from
+# their feature records, packed into shards under SORTER_DISCOVERY_TOKEN_BUDGET tokens, discovered concurrently,
+# and the per-shard {code: topic} maps are merged. A shard that fails only loses its own courses.
+SORTER_DISCOVERY_TOKEN_BUDGET = int(os.getenv("SORTER_DISCOVERY_TOKEN_BUDGET", "20000"))
+DISCOVERY_DOCS_PER_CODE = 2
+DISCOVERY_TYPES = (DOC_SYLLABUS, DOC_EXAM_GUIDE)
+
+
+def _code_key(course_code):
+    return str(course_code).replace(" ", "").upper()
+
+
+# Syllabi/outlines/exam guides always; other files only while they bring a course code that fewer than
+# DISCOVERY_DOCS_PER_CODE picked files mention. Falls back to every file when nothing qualifies.
+def select_discovery_candidates(file_data_list):
+    features = [get_document_features(data['path']) or {} for data in file_data_list]
+    picked = [features[idx].get("doc_type") in DISCOVERY_TYPES for idx in range(len(file_data_list))]
+
+    per_code = {}
+    for idx, record in enumerate(features):
+        if picked[idx]:
+            for code, _ in record.get("course_codes", []):
+                per_code[_code_key(code)] = per_code.get(_code_key(code), 0) + 1
+    for idx, record in enumerate(features):
+        codes = [_code_key(code) for code, _ in record.get("course_codes", [])]
+        if not picked[idx] and any(per_code.get(code, 0) < DISCOVERY_DOCS_PER_CODE for code in codes):
+            picked[idx] = True
+            for code in codes:
+                per_code[code] = per_code.get(code, 0) + 1
+
+    candidates = [data for data, keep in zip(file_data_list, picked) if keep]
+    return candidates or list(file_data_list)
+
+
+# Splits the candidates into shards whose file blocks stay under the token budget
+def pack_discovery_shards(file_data_list, token_budget):
+    shards, current, current_tokens = [], [], 0
+    for data in file_data_list:
+        cost = estimate_tokens(os.path.basename(data['path'])) + estimate_tokens(data['text'][:DISCOVERY_CHAR_BUDGET]) + 10
+        if current and current_tokens + cost > token_budget:
+            shards.append(current)
+            current, current_tokens = [], 0
+        current.append(data)
+        current_tokens += cost
+    if current:
+        shards.append(current)
+    return shards
+
+
+# One entry per course code ("PHYS234" and "PHYS 234" are the same course): the first spelling seen, with the
+# most descriptive (longest) topic any shard gave it, since a shard holding only a midterm overview knows little
+def merge_course_maps(course_maps):
+    merged, spelling = {}, {}
+    for course_map in course_maps:
+        if not isinstance(course_map, dict):
+            continue
+        for code, topic in course_map.items():
+            key = _code_key(code)
+            if key not in spelling:
+                spelling[key] = code
+                merged[code] = topic
+            elif len(str(topic)) > len(str(merged[spelling[key]])):
+                merged[spelling[key]] = topic
+    return merged
+
 
 # Prompting Gemini to search specifically for the syllabi in order to create a list of course codes and their subject
-def find_syllabus_courses(file_data_list, user_hints=None):
-    print("  -> Agent 1: Scanning for Syllabi to identify courses...")
-    
+def find_syllabus_courses(file_data_list, user_hints=None, max_workers=None):
+    if max_workers is None:
+        max_workers = SORTER_MAX_WORKERS
+
+    candidates = select_discovery_candidates(file_data_list)
+    shards = pack_discovery_shards(candidates, SORTER_DISCOVERY_TOKEN_BUDGET)
+    print(f"  -> Agent 1: Scanning {len(candidates)} likely syllabi/outlines (of {len(file_data_list)} files) "
+          f"in {len(shards)} request(s) to identify courses...")
+
+    return merge_course_maps(discover_shards(shards, user_hints, max_workers))
+
+
+# One course map per shard, requested concurrently (watch mode keeps them per shard to reuse the unchanged ones)
+def discover_shards(shards, user_hints=None, max_workers=None):
+    if max_workers is None:
+        max_workers = SORTER_MAX_WORKERS
+    return _map_in_order(lambda shard: discover_courses(shard, user_hints), shards, max_workers)
+
+
+# One discovery request over a shard of file headers. Returns {code: topic} ({} if the request fails).
+def discover_courses(file_data_list, user_hints=None):
     bulk_text = ""
     for idx, f in enumerate(file_data_list):
         bulk_text += f"--- FILE {idx}: {os.path.basename(f['path'])} ---\n"
-        bulk_text += f"{f['text'][:2000]}\n\n"
+        bulk_text += f"{f['text'][:DISCOVERY_CHAR_BUDGET]}\n\n"
 
     # Create a specific instruction if the user gave input
     hint_text = ""
@@ -70,27 +178,82 @@ def find_syllabus_courses(file_data_list, user_hints=None):
     """
     
     try:
-        response = model.generate_content(
+        response_text = cached_generate_content(
+            get_model("agent1"),
             prompt, 
-            generation_config={"response_mime_type": "application/json"}
+            agent="agent1",
+            generation_config={"response_mime_type": "application/json"},
+            validator=json.loads
         )
-        return json.loads(response.text)
+        with span("json.parse", "parse", agent="agent1", chars=len(response_text)):
+            return json.loads(response_text)
     except Exception as e:
-        print(f"    Warning: Could not auto-detect courses ({e}). Defaulting to generic.")
+        print(f"    Warning: Could not auto-detect courses in {len(file_data_list)} file(s) ({e}).")
         return {}
 
 
+# If the filename literally contains "HLTH 204" and that is a known course, match it immediately.
+def match_filename_to_course(filename, course_context_map):
+    for course_code in course_context_map.keys():
+        # ignore case sensitivity
+        if course_code.replace(" ", "").upper() in filename.replace(" ", "").upper():
+            return course_code
+    return None
+
+
+# A known course code that the document itself keeps mentioning (from its feature record), when it's the only one.
+# Catches "lecture3.pdf" whose slides say "PHYS 234" on every page, without an LLM call.
+MIN_CODE_MENTIONS = 2
+
+def match_features_to_course(features, course_context_map):
+    known = {_code_key(course_code): course_code for course_code in course_context_map}
+    hits = {
+        known[_code_key(code)]
+        for code, mentions in (features or {}).get("course_codes", [])
+        if mentions >= MIN_CODE_MENTIONS and _code_key(code) in known
+    }
+    return hits.pop() if len(hits) == 1 else None
+
+
+def _match_locally(data, course_context_map):
+    return (
+        match_filename_to_course(os.path.basename(data['path']), course_context_map)
+        or match_features_to_course(get_document_features(data['path']), course_context_map)
+    )
+
+
+# Files the filename/course-code checks couldn't place are scored against the course topics locally
+# (see local_classifier); only the ones too close to call stay None and go to Gemini.
+# The files already matched to a course are used as extra examples of what that course looks like.
+def _classify_unmatched(file_data, courses, course_context_map):
+    unmatched = [idx for idx, course in enumerate(courses) if course is None]
+    if not unmatched or not local_classifier_available():
+        return courses
+
+    seeds = {}
+    for data, course in zip(file_data, courses):
+        if course is not None:
+            seeds.setdefault(course, []).append(data['text'][:BATCH_SNIPPET_CHARS])
+    picks = classify_snippets(
+        [_snippet(file_data[idx], BATCH_SNIPPET_CHARS) for idx in unmatched], course_context_map, seeds
+    )
+    for idx, course in zip(unmatched, picks):
+        courses[idx] = course
+
+    matched = sum(1 for course in picks if course is not None)
+    print(f"  -> Agent 1: Matched {matched}/{len(unmatched)} files locally by topic similarity...")
+    return courses
+
+
 # After Gemini has identified the courses we associate the textbook and midterm material pdfs to those courses
 def assign_file_to_course(filename, text, course_context_map):
     if not course_context_map:
         return "General_Items"
 
     # First check is to see if the filename matches
-    # If the filename literally contains "HLTH 204" and that is a known course, match it immediately.
-    for course_code in course_context_map.keys():
-        # ignore case sensitivity
-        if course_code.replace(" ", "").upper() in filename.replace(" ", "").upper():
-            return course_code
+    matched = match_filename_to_course(filename, course_context_map)
+    if matched:
+        return matched
 
     # For files that aren't titled after the course code (like the textbook) let the AI make a guess
     prompt = f"""
@@ -115,8 +278,8 @@ def assign_file_to_course(filename, text, course_context_map):
     Return ONLY the Course Code string.
     """
     try:
-        response = model.generate_content(prompt)
-        cleaned = response.text.strip().replace('"', '').replace("'", "")
+        response_text = cached_generate_content(get_model("agent1"), prompt, agent="agent1")
+        cleaned = response_text.strip().replace('"', '').replace("'", "")
         
         # Ensure the AI returned a real course code from our list
         if cleaned in course_context_map:
@@ -125,28 +288,163 @@ def assign_file_to_course(filename, text, course_context_map):
     except Exception:
         return "General_Items"
 
-def sort_files(file_paths, user_hints=None):
+# Classifies a whole batch of files in ONE request. Returns {filename: course_code} for the entries the model got right.
+def classify_file_batch(batch, course_context_map):
+    files_block = ""
+    for data in batch:
+        files_block += f"--- FILE: {data['filename']} ---\n{data['text'][:BATCH_SNIPPET_CHARS]}\n\n"
+
+    prompt = f"""
+    Task: Match EVERY document below to the correct Course Code.
+    
+    KNOWN COURSES & TOPICS:
+    {json.dumps(course_context_map, indent=2)}
+    
+    INSTRUCTIONS:
+    1. ANALYZE THE TOPIC of each file's content snippet and match it to the best course topic.
+    2. MATCH THE FILENAME: If filename is "Midterm 1", match it to the course that mentions "Midterm" in its text or simply the best topic match.
+    3. BE AGGRESSIVE: Do not return "General_Items" unless the file is completely unrelated (like a cooking recipe).
+    
+    OUTPUT FORMAT:
+    Return valid JSON only. Key = Filename (exactly as given), Value = Course Code.
+    
+    FILES TO SORT:
+    {files_block}
+    """
+    try:
+        response_text = cached_generate_content(
+            get_model("agent1"),
+            prompt,
+            agent="agent1",
+            generation_config={"response_mime_type": "application/json"},
+            validator=json.loads
+        )
+        with span("json.parse", "parse", agent="agent1", chars=len(response_text)):
+            result = json.loads(response_text)
+    except Exception as e:
+        print(f"    Warning: Batch classification failed ({e}). Falling back to per-file matching.")
+        return {}
+
+    if not isinstance(result, dict):
+        return {}
+    return {name: code for name, code in result.items() if code in course_context_map or code == "General_Items"}
+
+
+# Splits the files into batches whose prompts stay under the token budget
+def pack_file_batches(file_entries, course_context_map, token_budget):
+    # Every batch repeats the course map and instructions, so that overhead comes off the top
+    overhead = estimate_tokens(json.dumps(course_context_map, indent=2)) + 300
+    batches = []
+    current, current_tokens, current_names = [], overhead, set()
+
+    for entry in file_entries:
+        cost = estimate_tokens(entry['filename']) + estimate_tokens(entry['text'][:BATCH_SNIPPET_CHARS]) + 10
+        # Two files with the same name would collide in the {filename: course} answer, so keep them apart
+        if current and (current_tokens + cost > token_budget or entry['filename'] in current_names):
+            batches.append(current)
+            current, current_tokens, current_names = [], overhead, set()
+        current.append(entry)
+        current_tokens += cost
+        current_names.add(entry['filename'])
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+# Runs fn over items on a thread pool (or serially), returning results in the original order
+def _map_in_order(fn, items, max_workers):
+    if max_workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(propagate(fn), items))
+    return [fn(item) for item in items]
+
+
+# Batched version of assign_file_to_course for a whole folder. Returns a course code per entry of file_data.
+def assign_files_batch(file_data, course_context_map, token_budget=None, max_workers=1):
+    if token_budget is None:
+        token_budget = SORTER_BATCH_TOKEN_BUDGET
+    if not course_context_map:
+        return ["General_Items"] * len(file_data)
+
+    courses = [_match_locally(data, course_context_map) for data in file_data]
+    _prefetch_snippets([data for data, course in zip(file_data, courses) if course is None], BATCH_SNIPPET_CHARS)
+    courses = _classify_unmatched(file_data, courses, course_context_map)
+
+    unmatched = []
+    for idx, data in enumerate(file_data):
+        if courses[idx] is None:
+            filename = os.path.basename(data['path'])
+            unmatched.append({"index": idx, "filename": filename, "text": _snippet(data, BATCH_SNIPPET_CHARS), "data": data})
+
+    batches = pack_file_batches(unmatched, course_context_map, token_budget)
+    if batches:
+        print(f"  -> Agent 1: Classifying {len(unmatched)} files in {len(batches)} batched request(s)...")
+    answers = _map_in_order(lambda batch: classify_file_batch(batch, course_context_map), batches, max_workers)
+
+    # Anything the model skipped or garbled gets the old one-file-per-request treatment
+    fallback = []
+    for batch, answer in zip(batches, answers):
+        for entry in batch:
+            if entry['filename'] in answer:
+                courses[entry['index']] = answer[entry['filename']]
+            else:
+                fallback.append(entry)
+
+    if fallback:
+        print(f"  -> Agent 1: {len(fallback)} file(s) missing from batch answers, matching individually...")
+        _prefetch_snippets([entry['data'] for entry in fallback], ASSIGN_CHAR_BUDGET)
+    results = _map_in_order(
+        lambda entry: assign_file_to_course(entry['filename'], _snippet(entry['data'], ASSIGN_CHAR_BUDGET), course_context_map),
+        fallback,
+        max_workers
+    )
+    for entry, course in zip(fallback, results):
+        courses[entry['index']] = course
+
+    return courses
+
+def sort_files(file_paths, user_hints=None, max_workers=None, batch=None):
     sorted_courses = {}
     file_data = []
+    if max_workers is None:
+        max_workers = SORTER_MAX_WORKERS
     
     # Step A: Read all files 
     print("Agent 1 (Sorter): Reading files...")
-    for f in file_paths:
-        text = extract_header_text(f)
+    # Only the header is read up front; files that need a longer snippet for matching are read further later.
+    # Headers are extracted across CPU cores; a file that hangs or blows up is skipped instead of stalling the run.
+    for f, text in zip(file_paths, extract_many([(f, DISCOVERY_CHAR_BUDGET, HEADER_PAGES) for f in file_paths])):
         if text:
-            file_data.append({"path": f, "text": text})
+            file_data.append({"path": f, "text": text, "complete": len(text) < DISCOVERY_CHAR_BUDGET})
     
     # Step B: Pass the user input to finding syllabus function
     course_context_map = find_syllabus_courses(file_data, user_hints)
     print(f"  -> Identified Contexts: {course_context_map}")
     
     # Step C: Match every file (including the syllabi themselves) to the right category
-    for data in file_data:
+    # Ask Gemini to match the files to the context map, several requests at a time (throttled by the shared limiter)
+    if batch is None:
+        batch = SORTER_BATCH_MODE
+
+    if batch:
+        courses = assign_files_batch(file_data, course_context_map, max_workers=max_workers)
+    else:
+        local = [_match_locally(data, course_context_map) if course_context_map else None for data in file_data]
+        _prefetch_snippets([data for data, course in zip(file_data, local) if course is None], ASSIGN_CHAR_BUDGET)
+        if course_context_map:
+            local = _classify_unmatched(file_data, local, course_context_map)
+        courses = _map_in_order(
+            lambda item: item[1] or assign_file_to_course(
+                os.path.basename(item[0]['path']), _snippet(item[0], ASSIGN_CHAR_BUDGET), course_context_map
+            ),
+            list(zip(file_data, local)),
+            max_workers
+        )
+
+    # Build the dictionary in the original file order so the output is the same as a serial run
+    for data, course in zip(file_data, courses):
         filename = os.path.basename(data['path'])
-        
-        # Ask Gemini to match this specific file to the context map
-        course = assign_file_to_course(filename, data['text'], course_context_map)
-        
         print(f"  -> '{filename}' assigned to: {course}")
         
         # Add to the dictionary
@@ -154,4 +452,4 @@ def sort_files(file_paths, user_hints=None):
             sorted_courses[course] = []
         sorted_courses[course].append(data['path'])
         
-    return sorted_courses
\ No newline at end of file
+    return sorted_courses
@@ -1,19 +1,38 @@
 import os
-import google.generativeai as genai
 import json
 import time
-from dotenv import load_dotenv
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+from .rate_limit import is_rate_limit_error, backoff_delay
+from .llm_cache import cached_generate_content
+from .llm_client import get_model
+from .tracing import span, count, propagate
+from .course_store import COURSE_STORE_ENABLED, document_fingerprint, get_analysis, store_analysis
+from .extract_pool import extract_documents
+from .pdf_reader import get_document_features
+from .context_packer import build_course_context, CHARS_PER_TOKEN
+from .progress import EVENT_COURSE_ANALYZED
 
-# API Key
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(
-        model_name="gemini-3-flash-preview", 
-        generation_config={"response_mime_type": "application/json"}
-    )
+# Agent 2 reads further into each document than the sorter does (past the cover pages, into the table of contents)
+ANALYST_CHAR_BUDGET = 60000
+ANALYST_MAX_PAGES = 12
+
+# Documents with a PDF outline (most textbooks) send their chapter table plus just the title pages
+ANALYST_OUTLINE_TEXT_BUDGET = 2000
+
+# Token budget for all of one course's documents together (exam guides and syllabi are packed first)
+ANALYST_TOKEN_BUDGET = int(os.getenv("ANALYST_TOKEN_BUDGET", str(ANALYST_CHAR_BUDGET // CHARS_PER_TOKEN)))
+
+# How many courses are analysed at once (all calls still share the Gemini rate limiter)
+ANALYST_MAX_WORKERS = int(os.getenv("ANALYST_MAX_WORKERS", "6"))
+
+# Total-hour targets for the easiest / hardest course a student takes (same ranges the prompt asks for)
+EASIEST_COURSE_HOURS = 12.5
+HARDEST_COURSE_HOURS = 32.5
+# Courses whose difficulty scores are within this ratio of each other keep their own estimates
+CLOSE_DIFFICULTY_RATIO = 1.25
 
 # Prompt 
 SYSTEM_PROMPT = """
@@ -25,7 +44,7 @@ You will receive text from multiple files (Syllabus, Midterm Overview).
 You must enforce this hierarchy strictly:
 
 1.  **TIER 1 (The Absolute Truth): "Midterm Overview" or "Exam Guide"**
-    * IF you see a file header like `=== Midterm Overview.pdf ===`, **ONLY** schedule the topics explicitly listed in that file's "Coverage" section.
+    * IF you see a file header like `=== Midterm Overview.pdf ===` (or one labelled `[EXAM GUIDE]`), **ONLY** schedule the topics explicitly listed in that file's "Coverage" section.
     * **DELETE RULE:** You must **DISCARD** any topic from the Syllabus that appears *after* the Midterm cutoff.
     * *Example:* If Midterm covers Ch 1-6, and Syllabus lists Ch 7 (Hydrogen Atom), **DO NOT INCLUDE CH 7.**
 
@@ -45,6 +64,7 @@ Compare the CURRENT course to that list.
 **PRIORITY RULES:**
 1.  **Scope:** STRICTLY follow the "Midterm Rule" above. Do not hallucinate extra chapters.
 2.  **Volume:** If a topic covers multiple chapters (e.g. "Ch 1-5"), assign a block of 8-12 hours.
+    If a TABLE OF CONTENTS with page counts is given, use the pages per chapter to size each topic.
 3.  **Multipliers:**
     -   Math/Physics/Systems: 1.5x (High Focus = true)
     -   Biology/Health/History: 0.7x (High Focus = false)
@@ -58,11 +78,42 @@ Compare the CURRENT course to that list.
 }
 """
 
+# Reads the documents of every course for Agent 2 in one multi-core pass. Returns {path: text}.
+# Documents with a PDF outline get their chapter table (a few hundred tokens, with page counts) instead
+# of the full ANALYST_CHAR_BUDGET of raw text. Outlines are read by the extraction workers, with the pages.
+def read_course_documents(course_files):
+    paths = [p for c, files in course_files.items() if c != "General_Items" for p in files]
+    jobs = [(p, ANALYST_CHAR_BUDGET, ANALYST_MAX_PAGES, ANALYST_OUTLINE_TEXT_BUDGET) for p in paths]
+
+    texts = {}
+    for path, (table, text) in zip(paths, extract_documents(jobs)):
+        texts[path] = f"{table}\n\n{text}" if table else text
+    return texts
+
+
+# Packs one course's documents (from read_course_documents) into its prompt context, under ANALYST_TOKEN_BUDGET.
+# Document types come from the feature records written while the PDFs were read.
+def course_context(file_paths, texts):
+    features = {p: get_document_features(p) for p in file_paths}
+    return build_course_context(file_paths, texts, ANALYST_TOKEN_BUDGET, features)
+
+
 # This is the main function that runs, it will combine the user input + the giant prompt above
-def analyze_course(course_name, structured_context, all_courses_list="None", user_constraints="None"):
+def analyze_course(course_name, structured_context, all_courses_list="None", user_constraints="None", progress=None):
     """
     Analyzes course text with RELATIVE AWARENESS and SCOPE ENFORCEMENT.
     """
+    data = request_analysis(course_name, structured_context, all_courses_list, user_constraints, progress)
+    if data is None:
+        return fallback_analysis(course_name)
+    return data
+
+
+# One Gemini analysis with 429 backoff. Returns None if it never produced valid JSON.
+# With a progress reporter (see progress.py) the cool-downs end early, raising PlannerCancelled, when the run is cancelled.
+def request_analysis(course_name, structured_context, all_courses_list="None", user_constraints="None", progress=None):
+    if progress is not None:
+        progress.check()
     print(f"  -> Agent 2 (Ranker): Analyzing '{course_name}' with Scope Enforcement...")
     
     user_prompt = f"""
@@ -71,7 +122,7 @@ def analyze_course(course_name, structured_context, all_courses_list="None", use
     USER CONSTRAINTS: {user_constraints}
     
     FULL COURSE CONTEXT (Syllabus + Midterm Files):
-    {structured_context[:60000]} 
+    {structured_context[:ANALYST_TOKEN_BUDGET * CHARS_PER_TOKEN]} 
     
     TASK: 
     1. Check for a "Midterm Overview" file. 
@@ -80,25 +131,147 @@ def analyze_course(course_name, structured_context, all_courses_list="None", use
     4. Estimate hours based on Relative Difficulty (Hard/Medium/Easy).
     """
     
-    max_retries = 3
+    max_retries = 4
     base_delay = 10 
     
     for attempt in range(max_retries):
         try:
-            response = model.generate_content(SYSTEM_PROMPT + "\n" + user_prompt)
-            data = json.loads(response.text)
+            response_text = cached_generate_content(
+                get_model("agent2"), SYSTEM_PROMPT + "\n" + user_prompt, agent="agent2", validator=json.loads
+            )
+            with span("json.parse", "parse", agent="agent2", chars=len(response_text)):
+                data = json.loads(response_text)
 
             if isinstance(data, list):
                 data = data[0]
 
             return data
         except Exception as e:
-            if "429" in str(e):
-                print(f"    ⚠️  Rate Limit Hit. Cooling down for {base_delay}s...")
-                time.sleep(base_delay)
-                base_delay *= 2 
+            if is_rate_limit_error(e) and attempt < max_retries - 1:
+                # Only this course's worker sleeps; the other courses keep going in the meantime
+                delay = backoff_delay(e, attempt, base_delay)
+                count("llm.retries")
+                print(f"    ⚠️  Rate Limit Hit on '{course_name}'. Cooling down for {delay:.1f}s...")
+                (progress.sleep if progress is not None else time.sleep)(delay)
             else:
                 print(f"    ❌ Error in Agent 2: {e}")
                 break
 
-    return {"topics": [{"topic": f"Review {course_name}", "est_hours": 5, "high_focus": False}]}
\ No newline at end of file
+    return None
+
+
+def fallback_analysis(course_name):
+    return {"topics": [{"topic": f"Review {course_name}", "est_hours": 5, "high_focus": False}]}
+
+
+def _topics(analysis):
+    if isinstance(analysis, list):
+        analysis = analysis[0] if analysis else {}
+    return analysis.get("topics", [])
+
+
+# Harder = more hours, and more of them High Focus
+def difficulty_score(analysis):
+    topics = _topics(analysis)
+    total = sum(float(t.get("est_hours", 0) or 0) for t in topics)
+    focus = sum(float(t.get("est_hours", 0) or 0) for t in topics if t.get("high_focus"))
+    return total * (1 + focus / total) if total else 0.0
+
+
+# Local replacement for the prompt's RELATIVE DIFFICULTY SCALING: the easiest of the student's courses gets
+# EASIEST_COURSE_HOURS and every other course that times its score ratio to the easiest one, capped at
+# HARDEST_COURSE_HOURS (a course twice as hard gets twice the hours). When all courses are about equally hard
+# (within CLOSE_DIFFICULTY_RATIO) the estimates are left alone.
+# Topic proportions within a course are kept. Returns new dicts, the stored base analyses are not touched.
+def scale_relative_difficulty(analyses):
+    scores = [difficulty_score(a) for a in analyses]
+    if len(analyses) < 2 or min(scores) <= 0 or max(scores) / min(scores) < CLOSE_DIFFICULTY_RATIO:
+        return analyses
+
+    low = min(scores)
+    max_ratio = HARDEST_COURSE_HOURS / EASIEST_COURSE_HOURS
+    scaled = []
+    for analysis, score in zip(analyses, scores):
+        topics = _topics(analysis)
+        total = sum(float(t.get("est_hours", 0) or 0) for t in topics)
+        if not total:
+            scaled.append(analysis)
+            continue
+        target = EASIEST_COURSE_HOURS * min(score / low, max_ratio)
+        factor = target / total
+        scaled.append({"topics": [
+            {**t, "est_hours": max(0.5, round(float(t.get("est_hours", 0) or 0) * factor * 2) / 2)}
+            for t in topics
+        ]})
+    return scaled
+
+
+# Store key for an analysis: the course documents, plus the user's constraints when there are any (they can
+# change what is studied, e.g. "skip chapter 3"), so constraint-free analyses stay shared between students
+def analysis_fingerprint(file_paths, user_constraints=None):
+    fingerprint = document_fingerprint(file_paths)
+    constraints = str(user_constraints or "").strip()
+    if constraints and constraints != "None":
+        fingerprint += ":" + hashlib.sha256(constraints.encode("utf-8")).hexdigest()[:16]
+    return fingerprint
+
+
+# Base analysis from the shared course store, or a fresh one (which is then stored).
+# The prompt gets no other courses here (relative difficulty is scaled locally afterwards), so the result can be
+# reused by every student with the same documents and constraints.
+def analyze_course_with_store(course_name, structured_context, file_paths, user_constraints="None", progress=None):
+    fingerprint = analysis_fingerprint(file_paths, user_constraints)
+    stored = get_analysis(course_name, fingerprint)
+    if stored is not None:
+        count("agent2.store_hit")
+        print(f"  -> Agent 2 (Ranker): Reusing stored analysis of '{course_name}'.")
+        return stored
+
+    count("agent2.store_miss")
+    data = request_analysis(course_name, structured_context, user_constraints=user_constraints, progress=progress)
+    if data is None:
+        return fallback_analysis(course_name)
+    store_analysis(course_name, fingerprint, data)
+    return data
+
+
+# Analyzes every course concurrently. course_contexts is a list of (course_name, structured_context).
+# Returns [{"course": ..., "analysis": ...}] in the same order, ready for Agent 3.
+# With course_files ({course: [pdf paths]}) the shared course store is used and difficulty is scaled locally.
+# With a progress reporter, a "course_analyzed" event is sent as each course finishes.
+def analyze_courses(course_contexts, all_courses_list="None", user_constraints="None", max_workers=None,
+                    course_files=None, progress=None):
+    if max_workers is None:
+        max_workers = ANALYST_MAX_WORKERS
+    use_store = COURSE_STORE_ENABLED and course_files is not None
+    finished = []
+    finished_lock = threading.Lock()
+
+    def analyze(item):
+        course_name, structured_context = item
+        if use_store:
+            analysis = analyze_course_with_store(
+                course_name, structured_context, course_files.get(course_name, []), user_constraints, progress
+            )
+        else:
+            analysis = analyze_course(course_name, structured_context, all_courses_list, user_constraints, progress)
+        if progress is not None:
+            with finished_lock:
+                finished.append(course_name)
+                done = len(finished)
+            progress.event(EVENT_COURSE_ANALYZED, course=course_name, done=done, total=len(course_contexts))
+        return analysis
+
+    if max_workers > 1 and len(course_contexts) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(course_contexts))) as pool:
+            analyses = list(pool.map(propagate(analyze), course_contexts))
+    else:
+        analyses = [analyze(item) for item in course_contexts]
+
+    if use_store:
+        analyses = scale_relative_difficulty(analyses)
+
+    return [
+        {"course": course_name, "analysis": analysis}
+        for (course_name, _), analysis in zip(course_contexts, analyses)
+    ]
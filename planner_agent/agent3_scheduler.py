@@ -1,15 +1,21 @@
 import os
-import google.generativeai as genai
 import json
 import datetime
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+from .llm_cache import cached_generate_content
+from .llm_client import get_model
+from .tracing import span, propagate
+from .local_scheduler import build_local_schedule, repair_schedule_locally
+from .progress import EVENT_DAY_DRAFTED
 
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-3-flash-preview")
+# "local" = deterministic in-process solver (milliseconds, any horizon), "llm" = Gemini drafts the whole plan
+SCHEDULER_ENGINE = os.getenv("PLANNER_SCHEDULER_ENGINE", "local")
+
+# Long LLM plans are drafted one window at a time so no single response hits the output limit
+SCHEDULE_WINDOW_DAYS = int(os.getenv("PLANNER_SCHEDULE_WINDOW_DAYS", "7"))
+SCHEDULER_MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", "4"))
+REVIEW_BUFFER_DAYS = 2
 
 SYSTEM_PROMPT = """
 You are an expert Time-Blocking Scheduler. 
@@ -57,16 +63,64 @@ Every single day object in your JSON output **MUST** explicitly include these 4
 }
 """
 
-def generate_schedule(all_course_data, start_date, end_date, user_constraints="None"):
+# The model sometimes wraps the JSON in markdown fences or chatter, so grab the outermost {...}
+def parse_schedule_json(text):
+    text = text.replace("```json", "").replace("```", "").strip()
+    
+    if "{" in text:
+        start = text.find("{")
+        end = text.rfind("}") + 1
+        return json.loads(text[start:end])
+    else:
+        return json.loads(text) # Attempt direct parse
+
+# Each finished draft day goes to the caller as a progress event. Files are only written for the approved plan.
+def _report_days(days, progress):
+    if progress is not None:
+        for day in days:
+            progress.event(EVENT_DAY_DRAFTED, date=day.get("date"), day=day)
+
+
+# progress (a ProgressReporter) gets an EVENT_DAY_DRAFTED per day as soon as it's available (in date order)
+def generate_schedule(all_course_data, start_date, end_date, user_constraints="None", engine=None, progress=None):
+    engine = engine or SCHEDULER_ENGINE
+    if engine == "local":
+        print(f"  -> Agent 3 (Local Solver): Building plan from {start_date} to {end_date}...")
+        result = build_local_schedule(all_course_data, start_date, end_date, user_constraints)
+        _report_days(result["schedule"], progress)
+        return result
+
     print(f"  -> Agent 3 (Scheduler): Building plan from {start_date} to {end_date}...")
     
     # 1. Calculate Duration (To prevent the 1-day cram bug)
+    days_available = _days_between(start_date, end_date)
+
+    # Multi-week horizons: draft week-sized windows concurrently and stream days back as they land
+    if days_available > SCHEDULE_WINDOW_DAYS:
+        days = []
+        for day in iter_schedule_days(all_course_data, start_date, end_date, user_constraints):
+            days.append(day)
+            _report_days([day], progress)
+        return {"schedule": days}
+
+    result = _draft_with_llm(all_course_data, start_date, end_date, user_constraints)
+    _report_days(result.get("schedule", []), progress)
+    return result
+
+
+def _days_between(start_date, end_date):
     try:
         start_dt = datetime.datetime.strptime(start_date, "%Y-%m-%d")
         end_dt = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-        days_available = (end_dt - start_dt).days + 1
+        return (end_dt - start_dt).days + 1
     except ValueError:
-        days_available = 14 # Fallback default
+        return 14 # Fallback default
+
+
+# One LLM request for the whole [start_date, end_date] range.
+# review_buffer=False is used for the early windows of a chunked plan, which must not end in review days.
+def _draft_with_llm(all_course_data, start_date, end_date, user_constraints="None", review_buffer=True):
+    days_available = _days_between(start_date, end_date)
     
     # 2. Prepare the Task List
     tasks_summary = ""
@@ -102,6 +156,11 @@ def generate_schedule(all_course_data, start_date, end_date, user_constraints="N
         3.  **Review Tasks:** Cut 'Review' time in half to save space.
         """
 
+    if review_buffer:
+        review_instruction = "CRITICAL: Ensure the last 2 days of the plan are 'Review Only' (The Review Buffer)."
+    else:
+        review_instruction = "NOTE: This is an early window of a longer plan. Schedule NEW content on every day (no Review Only days)."
+
     # 3. Building final prompt (Your Original + The Safety Instruction)
     user_prompt = f"""
     CURRENT DATE: {start_date}
@@ -118,21 +177,162 @@ def generate_schedule(all_course_data, start_date, end_date, user_constraints="N
     
     ACTION:
     Create the schedule. 
-    CRITICAL: Ensure the last 2 days of the plan are 'Review Only' (The Review Buffer).
+    {review_instruction}
     **MANDATORY:** You MUST include Morning Routine, Lunch, Dinner, and Sleep for EVERY DAY from Day 1 to Day {days_available}. Do not get lazy at the end.
     """
     
     try:
-        response = model.generate_content(SYSTEM_PROMPT + "\n" + user_prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        
-        if "{" in text:
-            start = text.find("{")
-            end = text.rfind("}") + 1
-            return json.loads(text[start:end])
-        else:
-            return json.loads(text) # Attempt direct parse
-            
+        response_text = cached_generate_content(
+            get_model("agent3"), SYSTEM_PROMPT + "\n" + user_prompt, agent="agent3", validator=parse_schedule_json
+        )
+        with span("json.parse", "parse", agent="agent3", chars=len(response_text)):
+            return parse_schedule_json(response_text)
+
     except Exception as e:
         print(f"    ❌ Error in Scheduler: {e}")
-        return {"schedule": []}
\ No newline at end of file
+        return {"schedule": []}
+
+
+# Splits the horizon into week-sized windows and hands each one its share of the work.
+# The ledger carries every topic's remaining hours forward, so windows get consecutive slices of each
+# course (in topic order) and can then be drafted independently of each other.
+def plan_windows(all_course_data, start_date, end_date, window_days=None):
+    window_days = window_days or SCHEDULE_WINDOW_DAYS
+    days_available = _days_between(start_date, end_date)
+    try:
+        start_dt = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+    except ValueError:
+        start_dt = datetime.date.today()
+
+    windows = []
+    for offset in range(0, days_available, window_days):
+        length = min(window_days, days_available - offset)
+        windows.append((start_dt + datetime.timedelta(days=offset), length))
+    # A tiny trailing window couldn't hold the whole review buffer, so fold it into the previous one
+    if len(windows) > 1 and windows[-1][1] <= REVIEW_BUFFER_DAYS:
+        tail = windows.pop()
+        windows[-1] = (windows[-1][0], windows[-1][1] + tail[1])
+
+    ledger = []
+    for course_entry in all_course_data:
+        analysis = course_entry['analysis']
+        if isinstance(analysis, list): analysis = analysis[0]
+        ledger.append((course_entry['course'], [dict(t) for t in analysis.get('topics', [])]))
+
+    study_days_left = max(1, days_available - REVIEW_BUFFER_DAYS)
+    plans = []
+    for index, (window_start, length) in enumerate(windows):
+        is_final = index == len(windows) - 1
+        window_study_days = min(length, study_days_left)
+        window_courses = []
+
+        for course, topics in ledger:
+            remaining = sum(float(t.get('est_hours', 1) or 0) for t in topics)
+            # The final window takes whatever is left; earlier ones take their share of study days
+            if is_final:
+                quota = remaining
+            else:
+                quota = round(remaining * window_study_days / max(1, study_days_left) * 2) / 2
+            window_topics = []
+            while topics and quota > 0:
+                hours = float(topics[0].get('est_hours', 1) or 0)
+                take = min(hours, quota)
+                window_topics.append({**topics[0], "est_hours": take})
+                quota -= take
+                if take >= hours:
+                    topics.pop(0)
+                else:
+                    topics[0]["est_hours"] = hours - take
+            if window_topics:
+                window_courses.append({"course": course, "analysis": {"topics": window_topics}})
+
+        study_days_left = max(1, study_days_left - window_study_days)
+        window_end = window_start + datetime.timedelta(days=length - 1)
+        plans.append({
+            "start": window_start.strftime("%Y-%m-%d"),
+            "end": window_end.strftime("%Y-%m-%d"),
+            "course_data": window_courses,
+            "review_buffer": is_final,
+        })
+    return plans
+
+
+# Drafts every window concurrently and yields finished days in date order.
+# The first week is yielded as soon as its window returns, without waiting for the later ones.
+def iter_schedule_days(all_course_data, start_date, end_date, user_constraints="None", window_days=None, max_workers=None):
+    plans = plan_windows(all_course_data, start_date, end_date, window_days)
+    max_workers = max_workers or SCHEDULER_MAX_WORKERS
+    print(f"    -> Drafting {len(plans)} window(s) of up to {window_days or SCHEDULE_WINDOW_DAYS} days...")
+
+    def draft(plan):
+        result = _draft_with_llm(plan["course_data"], plan["start"], plan["end"], user_constraints, plan["review_buffer"])
+        if not result.get("schedule"):
+            # A failed window shouldn't sink the whole plan: the local solver fills it with the same workload
+            print(f"    ⚠️  Window {plan['start']}..{plan['end']} failed, using the local solver for it.")
+            # (The local solver always ends on review days, so early windows are solved 2 days longer and trimmed)
+            end = plan["end"] if plan["review_buffer"] else _extend(plan["end"], REVIEW_BUFFER_DAYS)
+            result = build_local_schedule(plan["course_data"], plan["start"], end, user_constraints)
+            if not plan["review_buffer"]:
+                result["schedule"] = result["schedule"][:-REVIEW_BUFFER_DAYS]
+        return result.get("schedule", [])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(plans)))) as pool:
+        futures = [pool.submit(propagate(draft), plan) for plan in plans]
+        for future in futures:
+            for day in future.result():
+                yield day
+
+
+def _extend(date_str, days):
+    return (datetime.datetime.strptime(date_str, "%Y-%m-%d") + datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+# Violations the local solver knows how to fix without touching the rest of the plan
+LOCALLY_REPAIRABLE = {"burnout", "night_work", "missing_course", "total_hours", "overlap"}
+# Agent 4's free-text constraint verdicts: with the local engine on, the days they name are unpinned and re-solved
+# locally too; Gemini only redrafts them when the local engine is off
+CONSTRAINT_VIOLATIONS = {"user_constraint"}
+
+
+def _locally_repairable(violations):
+    codes = LOCALLY_REPAIRABLE | (CONSTRAINT_VIOLATIONS if SCHEDULER_ENGINE == "local" else set())
+    return bool(violations) and all(v.code in codes for v in violations)
+
+
+# Called instead of a from-scratch redraft after Agent 4 rejects a plan.
+# 'feedback' is Agent 4's AuditFeedback; its structured violations say which days/courses are broken.
+def repair_schedule(schedule_data, feedback, all_course_data, start_date, end_date, user_constraints="None",
+                    progress=None):
+    violations = getattr(feedback, "violations", [])
+
+    if schedule_data.get("schedule") and _locally_repairable(violations):
+        targets = sorted({
+            v.date or v.course or ("user constraints" if v.code in CONSTRAINT_VIOLATIONS else "workload")
+            for v in violations
+        })
+        print(f"  -> Agent 3 (Repair): Re-solving only {', '.join(targets)}...")
+        repaired = repair_schedule_locally(schedule_data, violations, all_course_data, user_constraints)
+        _report_days(repaired.get("schedule", []), progress)
+        return repaired
+
+    # Nothing to repair from (or feedback without structured violations): the local engine solves it again
+    if SCHEDULER_ENGINE == "local":
+        return generate_schedule(all_course_data, start_date, end_date, user_constraints, engine="local",
+                                 progress=progress)
+
+    # With the local engine off, free-text feedback goes to Gemini. Only the LATEST correction is sent,
+    # so the prompt stays the same size no matter how many attempts came before.
+    redraft = generate_schedule(
+        all_course_data, start_date, end_date,
+        f"{user_constraints} [CORRECTION REQUIRED: {feedback}]",
+        engine="llm", progress=progress
+    )
+    if redraft.get("schedule"):
+        return redraft
+
+    # A failed redraft must not wipe out the plan: keep the current draft, or solve locally if there is none
+    if schedule_data.get("schedule"):
+        print("    ⚠️  Redraft failed, keeping the previous draft.")
+        return schedule_data
+    print("    ⚠️  Redraft failed, using the local solver.")
+    return generate_schedule(all_course_data, start_date, end_date, user_constraints, engine="local", progress=progress)
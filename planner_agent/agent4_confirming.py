@@ -1,18 +1,10 @@
-import os
-import google.generativeai as genai
 import json
-from dotenv import load_dotenv
 
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-
-if api_key:
-    genai.configure(api_key=api_key)
-    # Using the smart model (Flash 2.0) for high-level reasoning
-    model = genai.GenerativeModel(
-        model_name="gemini-3-flash-preview", 
-        generation_config={"response_mime_type": "application/json"}
-    )
+from .llm_cache import cached_generate_content
+from .llm_client import get_model
+from .tracing import span
+from .schedule_validator import AuditFeedback, Violation, validate_schedule, required_courses_and_hours
+from .schedule_model import ScheduleModel
 
 SYSTEM_PROMPT = """
 You are an expert Audit & Compliance AI.
@@ -46,34 +38,26 @@ def audit_schedule(schedule_data, user_constraints, all_course_data):
     """
     Now accepts 'all_course_data' so it knows what courses MUST exist.
     """
-    print("  -> Agent 4 (AI Auditor): verifying completeness & logic...")
+    print("  -> Agent 4 (Auditor): running local checks (coverage, burnout, sleep, workload)...")
     
-    if "schedule" not in schedule_data or not schedule_data["schedule"]:
-        return False, "CRITICAL: The schedule was empty."
+    # 1. Fast path: the arithmetic checks run locally in one pass, no network round trip
+    is_valid, feedback = validate_schedule(schedule_data, all_course_data, user_constraints)
+    if not is_valid:
+        print(f"  -> Agent 4: ❌ Local Audit Failed. Feedback: {feedback}")
+        return is_valid, feedback
+
+    # 2. Nothing fuzzy left to judge -> no need to ask Gemini at all
+    if not str(user_constraints or "").strip() or str(user_constraints).strip().lower() == "none":
+        print("  -> Agent 4: ✅ Schedule approved (local checks).")
+        return is_valid, feedback
 
-    # 1. Extract the Requirements (The "Answer Key")
-    required_courses = []
-    total_hours_needed = 0
-    for c in all_course_data:
-        c_name = c['course']
-        required_courses.append(c_name)
-        # Sum up hours to give Agent 4 a sense of scale
-        # (Assuming the analysis structure from Agent 2)
-        analysis = c['analysis']
-        if isinstance(analysis, list): analysis = analysis[0]
-        for t in analysis.get('topics', []):
-            total_hours_needed += t.get('est_hours', 0)
+    print("  -> Agent 4 (AI Auditor): checking user constraints...")
+    required_courses, total_hours_needed = required_courses_and_hours(all_course_data)
 
-    # 2. Minify Schedule for the Prompt
-    minified_schedule = []
-    for day in schedule_data["schedule"]:
-        day_summary = {
-            "date": day.get("date"),
-            "events": [f"{e.get('time')} - {e.get('task')}" for e in day.get("events", [])]
-        }
-        minified_schedule.append(day_summary)
+    # 3. Minify Schedule for the Prompt
+    minified_schedule = ScheduleModel.from_json(schedule_data).minified()
 
-    # 3. Build the "Project Manager" Prompt
+    # 4. Build the "Project Manager" Prompt (only the user constraints are still in question)
     user_prompt = f"""
     --- REQUIREMENTS (INPUT) ---
     REQUIRED COURSES: {", ".join(required_courses)}
@@ -84,26 +68,28 @@ def audit_schedule(schedule_data, user_constraints, all_course_data):
     {json.dumps(minified_schedule, indent=2)}
     
     --- MISSION ---
-    Audit this plan. 
-    1. Did Agent 3 forget any courses? (Check {required_courses} vs the Plan).
-    2. Is the schedule biologically realistic?
-    3. Did it follow user constraints?
+    Completeness, burnout (>10h/day), night-time tasks and total hours have ALREADY PASSED automated checks.
+    Only audit whether the plan follows the USER CONSTRAINTS above.
     """
     
     try:
-        response = model.generate_content(SYSTEM_PROMPT + "\n" + user_prompt)
-        result = json.loads(response.text)
+        response_text = cached_generate_content(
+            get_model("agent4"), SYSTEM_PROMPT + "\n" + user_prompt, agent="agent4", validator=json.loads
+        )
+        with span("json.parse", "parse", agent="agent4", chars=len(response_text)):
+            result = json.loads(response_text)
         
         is_valid = result.get("valid", False)
         feedback = result.get("feedback", "Unknown Error")
         
         if is_valid:
             print("  -> Agent 4: ✅ Schedule approved.")
-        else:
-            print(f"  -> Agent 4: ❌ Audit Failed. Feedback: {feedback}")
-            
-        return is_valid, feedback
+            return is_valid, AuditFeedback(feedback)
+
+        print(f"  -> Agent 4: ❌ Audit Failed. Feedback: {feedback}")
+        return is_valid, AuditFeedback(feedback, [Violation("user_constraint", feedback)])
 
     except Exception as e:
+        # The hard rules already passed locally, so a broken LLM call only skips the fuzzy constraint review
         print(f"    ❌ Error in Agent 4: {e}")
-        return True, "Auditor bypassed due to error."
\ No newline at end of file
+        return True, AuditFeedback("Approved by local checks. User constraint review skipped due to error.")
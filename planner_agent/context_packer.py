@@ -0,0 +1,117 @@
+import os
+
+from .tracing import count
+from .doc_features import text_features, DOC_EXAM_GUIDE, DOC_SYLLABUS, DOC_TEXTBOOK, DOC_SLIDES, DOC_OTHER
+
+# Packs a course's documents into one prompt context under a token budget.
+# Documents are ranked by how much they decide the plan's scope (the prompt's tier list): midterm overviews /
+# exam guides first, then syllabi, then textbook tables of contents, then everything else. Higher tiers are
+# always included whole if they fit; whatever budget is left goes to the lower tiers, which are cut at a line
+# boundary (or dropped) instead of pushing the exam guide out of the prompt.
+
+CHARS_PER_TOKEN = 4
+
+PRIORITY_EXAM_GUIDE = 0
+PRIORITY_SYLLABUS = 1
+PRIORITY_TEXTBOOK_TOC = 2
+PRIORITY_OTHER = 3
+
+# A section cut shorter than this is just noise, so it's left out instead
+MIN_SECTION_TOKENS = 100
+TRUNCATION_NOTE = "\n[... truncated to fit the context budget]"
+
+DOC_PRIORITIES = {
+    DOC_EXAM_GUIDE: PRIORITY_EXAM_GUIDE,
+    DOC_SYLLABUS: PRIORITY_SYLLABUS,
+    DOC_TEXTBOOK: PRIORITY_TEXTBOOK_TOC,
+}
+DOC_LABELS = {DOC_EXAM_GUIDE: "EXAM GUIDE", DOC_SYLLABUS: "SYLLABUS", DOC_TEXTBOOK: "TEXTBOOK", DOC_SLIDES: "SLIDES"}
+_CHAPTER_TABLE = "TABLE OF CONTENTS (from the PDF outline"
+
+# Only the start of a document is used to guess what it is when there's no feature record for it
+CLASSIFY_CHARS = 500
+
+
+# Rough token count (~4 characters per token), good enough for packing prompts under a budget
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# Type of a document: from its feature record (see doc_features) when there is one, else from filename + opening text
+def document_type(path, text="", features=None):
+    if features:
+        return features.get("doc_type", DOC_OTHER)
+    if text.startswith(_CHAPTER_TABLE):
+        return DOC_TEXTBOOK
+    return text_features(path, text[:CLASSIFY_CHARS])["doc_type"]
+
+
+def document_priority(path, text="", features=None):
+    doc_type = document_type(path, text, features)
+    if doc_type == DOC_OTHER and text.startswith(_CHAPTER_TABLE):
+        return PRIORITY_TEXTBOOK_TOC
+    return DOC_PRIORITIES.get(doc_type, PRIORITY_OTHER)
+
+
+def _section(name, text):
+    return f"\n\n=== DOC: {name} ===\n{text}\n=== END DOC ===\n"
+
+
+# "Midterm Overview.pdf [EXAM GUIDE]", so the prompt's tier rules don't depend on the filename alone
+def _label(path, doc_type):
+    label = DOC_LABELS.get(doc_type)
+    return f"{os.path.basename(path)} [{label}]" if label else os.path.basename(path)
+
+
+# Longest prefix of text (ending at a line break where possible) that, with the note, fits in max_chars
+def _cut(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    max_chars -= len(TRUNCATION_NOTE)
+    cut = text.rfind("\n", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = max_chars
+    return text[:cut] + TRUNCATION_NOTE
+
+
+# sections is a list of {"name", "text", "priority"}; returns the packed context string.
+# Sections keep their original order within a tier. Built with one join, so cost is linear in the output.
+def pack_context(sections, token_budget):
+    ranked = sorted(enumerate(sections), key=lambda item: (item[1]["priority"], item[0]))
+    remaining = token_budget
+    parts = []
+
+    for _, section in ranked:
+        framing = estimate_tokens(_section(section["name"], ""))
+        cost = framing + estimate_tokens(section["text"])
+        if cost <= remaining:
+            parts.append(_section(section["name"], section["text"]))
+            remaining -= cost
+            continue
+
+        room = remaining - framing
+        if room < MIN_SECTION_TOKENS:
+            count("context.dropped_docs")
+            continue
+        count("context.truncated_docs")
+        text = _cut(section["text"], room * CHARS_PER_TOKEN)
+        parts.append(_section(section["name"], text))
+        remaining -= framing + estimate_tokens(text)
+
+    return "".join(parts)
+
+
+# Context for one course: texts is {path: text}, file_paths the course's documents,
+# features (optional) the documents' feature records {path: record}
+def build_course_context(file_paths, texts, token_budget, features=None):
+    features = features or {}
+    sections = []
+    for p in file_paths:
+        text = texts.get(p, "")
+        doc_type = document_type(p, text, features.get(p))
+        sections.append({
+            "name": _label(p, doc_type),
+            "text": text,
+            "priority": document_priority(p, text, features.get(p)),
+        })
+    return pack_context(sections, token_budget)
@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+from .pdf_cache import CACHE_DIR, file_digest
+
+# Persistent store of Agent 2 course analyses, shared across students and runs.
+# Students in the same course upload the same syllabus / midterm overview, so the (student-independent) base
+# analysis is keyed by course code + a fingerprint of the document CONTENTS and computed once per course.
+# Only the relative-difficulty scaling against each student's other courses is redone per run (locally).
+# Point PLANNER_COURSE_STORE_PATH at a shared location to reuse analyses across machines/deployments.
+COURSE_STORE_PATH = os.getenv("PLANNER_COURSE_STORE_PATH", os.path.join(CACHE_DIR, "course_analyses.sqlite3"))
+COURSE_STORE_ENABLED = os.getenv("PLANNER_COURSE_STORE", "1") != "0"
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(COURSE_STORE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(COURSE_STORE_PATH, check_same_thread=False, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS course_analyses (
+                course TEXT,
+                fingerprint TEXT,
+                analysis TEXT,
+                created_at REAL,
+                last_used REAL,
+                PRIMARY KEY (course, fingerprint)
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+
+def _normalize_course(course):
+    return " ".join(str(course).split()).upper()
+
+
+# Order-independent: the same set of PDFs gives the same fingerprint whatever they're called or listed as
+def document_fingerprint(file_paths):
+    digests = sorted(file_digest(p) for p in file_paths if os.path.exists(p))
+    return hashlib.sha256("\n".join(digests).encode("utf-8")).hexdigest()
+
+
+def get_analysis(course, fingerprint):
+    with _lock:
+        conn = _connection()
+        row = conn.execute(
+            "SELECT analysis FROM course_analyses WHERE course = ? AND fingerprint = ?",
+            (_normalize_course(course), fingerprint)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE course_analyses SET last_used = ? WHERE course = ? AND fingerprint = ?",
+            (time.time(), _normalize_course(course), fingerprint)
+        )
+        conn.commit()
+    try:
+        return json.loads(row[0])
+    except ValueError:
+        return None
+
+
+def store_analysis(course, fingerprint, analysis):
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO course_analyses (course, fingerprint, analysis, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (_normalize_course(course), fingerprint, json.dumps(analysis), now, now)
+        )
+        conn.commit()
+
+
+def clear(course=None):
+    with _lock:
+        conn = _connection()
+        if course:
+            cursor = conn.execute("DELETE FROM course_analyses WHERE course = ?", (_normalize_course(course),))
+        else:
+            cursor = conn.execute("DELETE FROM course_analyses")
+        conn.commit()
+        return cursor.rowcount
+
+
+# Usage: python -m planner_agent.course_store --clear [--course "PHYS 234"]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the shared course analysis store.")
+    parser.add_argument("--clear", action="store_true", help="Delete stored analyses.")
+    parser.add_argument("--course", help="Only clear analyses of this course.")
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = clear(args.course)
+        print(f"🗑️  Removed {removed} stored analyses from '{COURSE_STORE_PATH}'.")
+        sys.exit(0)
+
+    with _lock:
+        rows = _connection().execute(
+            "SELECT course, COUNT(*) FROM course_analyses GROUP BY course ORDER BY course"
+        ).fetchall()
+    print(f"📦 {sum(n for _, n in rows)} stored analyses for {len(rows)} course(s) in '{COURSE_STORE_PATH}'.")
+    for course, n in rows:
+        print(f"   {course}: {n} document set(s)")
@@ -0,0 +1,208 @@
+import os
+import re
+import datetime
+from collections import Counter
+
+# Single-pass document feature extractor.
+# One precompiled pattern is run over each page as it is read and picks up, in the same scan:
+#   - dates in many formats ("March 5, 2026", "Mar. 5th", "5 March 2026", "2026-03-05", "3/5/26"),
+#     flagged as exam dates when they follow an exam keyword ("Midterm:", "Final Exam", "Date:") closely,
+#   - candidate course codes ("PHYS 234", "MATH136"),
+#   - keywords that tell a syllabus, exam guide, textbook or lecture slides apart.
+# The result is a small per-document record cached next to the extracted text, so Agent 1 (course codes),
+# Agent 2 (which document is the "Tier 1" exam guide) and the ADK tool (exam dates) reuse it instead of
+# rescanning text.
+
+DOC_EXAM_GUIDE = "exam_guide"
+DOC_SYLLABUS = "syllabus"
+DOC_TEXTBOOK = "textbook"
+DOC_SLIDES = "slides"
+DOC_OTHER = "other"
+
+# keyword -> (document type, weight). Words every course document uses ("exam", "midterm", "overview") count
+# once; words that only one kind of document uses ("office hours", "study guide", "isbn") count several times.
+KEYWORD_TYPES = {
+    "midterm": (DOC_EXAM_GUIDE, 1), "final exam": (DOC_EXAM_GUIDE, 1), "exam": (DOC_EXAM_GUIDE, 1),
+    "overview": (DOC_EXAM_GUIDE, 1), "coverage": (DOC_EXAM_GUIDE, 2),
+    "review sheet": (DOC_EXAM_GUIDE, 3), "study guide": (DOC_EXAM_GUIDE, 3),
+    "syllabus": (DOC_SYLLABUS, 3), "course outline": (DOC_SYLLABUS, 3), "grading": (DOC_SYLLABUS, 3),
+    "office hours": (DOC_SYLLABUS, 3), "learning outcomes": (DOC_SYLLABUS, 3), "prerequisite": (DOC_SYLLABUS, 3),
+    "textbook": (DOC_TEXTBOOK, 1), "chapter": (DOC_TEXTBOOK, 1), "edition": (DOC_TEXTBOOK, 2),
+    "isbn": (DOC_TEXTBOOK, 3), "preface": (DOC_TEXTBOOK, 2), "table of contents": (DOC_TEXTBOOK, 2),
+    "copyright": (DOC_TEXTBOOK, 1),
+    "lecture": (DOC_SLIDES, 1), "slides": (DOC_SLIDES, 1), "slide": (DOC_SLIDES, 1),
+}
+# Syllabi talk about their exams a lot, so a document only counts as an exam guide when its exam score is at
+# least this many times its syllabus score
+EXAM_GUIDE_MARGIN = 2
+# Keywords after which a date is taken to be an exam date
+EXAM_CONTEXT_WORDS = {"midterm", "final exam", "exam", "test", "quiz", "date:", "final"}
+EXAM_CONTEXT_CHARS = 80
+
+# The filename says more about a document than the words inside it: a filename keyword decides the type,
+# and a course code in the filename counts as several mentions
+FILENAME_WEIGHT = 5
+MIN_TYPE_SCORE = 2
+MAX_COURSE_CODES = 5
+MAX_DATES = 50
+# Bumped whenever the scoring changes, so records cached with the old scoring are recomputed
+FEATURES_VERSION = 2
+
+# Upper-case words that look like course codes but aren't ("PAGE 123", "ROOM 101")
+NOT_SUBJECTS = {"PAGE", "ROOM", "ISBN", "FIG", "TABLE", "UNIT", "WEEK", "CH", "NO", "PP", "EX", "SEC", "VOL", "ED", "AM", "PM"}
+
+_MONTH = (r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?")
+_DAY = r"(?:3[01]|[12]\d|0?[1-9])(?:st|nd|rd|th)?"
+_YEAR = r"(?:19|20)\d{2}"
+_KEYWORDS = sorted(set(KEYWORD_TYPES) | EXAM_CONTEXT_WORDS, key=len, reverse=True)
+
+FEATURE_PATTERN = re.compile(
+    rf"(?i:\b(?P<md_month>{_MONTH})\.?\s+(?P<md_day>{_DAY})\b(?:,?\s+(?P<md_year>{_YEAR})\b)?)"
+    rf"|(?i:\b(?P<dm_day>{_DAY})\s+(?P<dm_month>{_MONTH})\b\.?(?:,?\s+(?P<dm_year>{_YEAR})\b)?)"
+    rf"|\b(?P<iso_year>{_YEAR})-(?P<iso_month>1[0-2]|0?[1-9])-(?P<iso_day>3[01]|[12]\d|0?[1-9])\b"
+    rf"|\b(?P<us_month>1[0-2]|0?[1-9])/(?P<us_day>3[01]|[12]\d|0?[1-9])/(?P<us_year>(?:19|20)?\d{{2}})\b"
+    rf"|\b(?P<subject>[A-Z]{{2,5}}) ?(?P<number>\d{{3}}[A-Z]?)\b"
+    rf"|(?i:\b(?P<keyword>{'|'.join(re.escape(k) for k in _KEYWORDS)})(?![a-z]))"
+)
+
+_MONTHS = {m: i + 1 for i, m in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])}
+
+
+def _month_number(text):
+    return _MONTHS[text[:3].lower()]
+
+
+def _day_number(text):
+    return int(re.match(r"\d+", text).group())
+
+
+# Highest-scoring type, except that an exam guide has to beat the syllabus score by EXAM_GUIDE_MARGIN
+def _pick_type(scores):
+    doc_type = scores.most_common(1)[0][0]
+    if doc_type == DOC_EXAM_GUIDE and scores[DOC_EXAM_GUIDE] < EXAM_GUIDE_MARGIN * scores[DOC_SYLLABUS]:
+        return DOC_SYLLABUS
+    return doc_type
+
+
+class DocumentFeatures:
+    """Accumulates features page by page (add_page) and turns them into a cacheable record (record)."""
+
+    def __init__(self, filename=""):
+        self.pages = 0
+        self.dates = set()            # (year or None, month, day)
+        self.exam_dates = set()
+        self.codes = Counter()
+        self.type_scores = Counter()
+        self.years = Counter()
+        self.filename_type = None
+        if filename:
+            # "PHYS234_midterm_overview": underscores are word characters, so they'd hide every keyword from \b
+            name = os.path.splitext(os.path.basename(filename))[0].replace("_", " ")
+            self._scan(name, weight=FILENAME_WEIGHT, with_dates=False)
+            if self.type_scores:
+                self.filename_type = _pick_type(self.type_scores)
+
+    def add_page(self, text):
+        self._scan(text)
+        self.pages += 1
+
+    def _scan(self, text, weight=1, with_dates=True):
+        last_exam_word = None
+        for m in FEATURE_PATTERN.finditer(text):
+            keyword = m.group("keyword")
+            if keyword is not None:
+                keyword = keyword.lower()
+                if keyword in KEYWORD_TYPES:
+                    doc_type, keyword_weight = KEYWORD_TYPES[keyword]
+                    self.type_scores[doc_type] += keyword_weight * weight
+                if keyword in EXAM_CONTEXT_WORDS:
+                    last_exam_word = m.end()
+                continue
+
+            subject = m.group("subject")
+            if subject is not None:
+                if subject not in NOT_SUBJECTS:
+                    self.codes[f"{subject} {m.group('number')}"] += weight
+                continue
+
+            if not with_dates:
+                continue
+            date = self._date(m)
+            if date is None:
+                continue
+            self.dates.add(date)
+            if date[0]:
+                self.years[date[0]] += 1
+            # Only the first date after an exam keyword is the exam's ("Midterm: March 5 ... due March 2" isn't two exams)
+            if last_exam_word is not None and m.start() - last_exam_word <= EXAM_CONTEXT_CHARS:
+                self.exam_dates.add(date)
+            last_exam_word = None
+
+    @staticmethod
+    def _date(m):
+        if m.group("md_month"):
+            year, month, day = m.group("md_year"), _month_number(m.group("md_month")), _day_number(m.group("md_day"))
+        elif m.group("dm_month"):
+            year, month, day = m.group("dm_year"), _month_number(m.group("dm_month")), _day_number(m.group("dm_day"))
+        elif m.group("iso_year"):
+            year, month, day = m.group("iso_year"), int(m.group("iso_month")), int(m.group("iso_day"))
+        else:
+            year, month, day = m.group("us_year"), int(m.group("us_month")), int(m.group("us_day"))
+            if year and len(year) == 2:
+                year = "20" + year
+        year = int(year) if year else None
+        try:
+            datetime.date(year or 2000, month, day)  # 2000 is a leap year, so Feb 29 survives
+        except ValueError:
+            return None
+        return year, month, day
+
+    def doc_type(self):
+        if self.filename_type:
+            return self.filename_type
+        if not self.type_scores:
+            return DOC_OTHER
+        doc_type = _pick_type(self.type_scores)
+        return doc_type if self.type_scores[doc_type] >= MIN_TYPE_SCORE else DOC_OTHER
+
+    # Dates without a year get the year the document mentions most (or stay "--MM-DD" for the caller to resolve)
+    def _iso(self, date):
+        year = date[0] or (self.years.most_common(1)[0][0] if self.years else None)
+        return f"{year:04d}-{date[1]:02d}-{date[2]:02d}" if year else f"--{date[1]:02d}-{date[2]:02d}"
+
+    def record(self):
+        return {
+            "version": FEATURES_VERSION,
+            "pages_scanned": self.pages,
+            "doc_type": self.doc_type(),
+            "type_scores": dict(self.type_scores),
+            "course_codes": self.codes.most_common(MAX_COURSE_CODES),
+            "exam_dates": sorted({self._iso(d) for d in self.exam_dates})[:MAX_DATES],
+            "dates": sorted({self._iso(d) for d in self.dates})[:MAX_DATES],
+        }
+
+
+# Features of a piece of text that isn't tied to a cached document (e.g. a filename and a snippet)
+def text_features(filename, text=""):
+    features = DocumentFeatures(filename)
+    if text:
+        features.add_page(text)
+    return features.record()
+
+
+# "2026-03-05" or "--03-05" (no year in the document) -> date, using default_year for the latter
+def resolve_date(value, default_year):
+    try:
+        if value.startswith("--"):
+            month, day = value[2:].split("-")
+            return datetime.date(default_year, int(month), int(day))
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def latest_exam_date(records, default_year):
+    dates = [resolve_date(v, default_year) for r in records if r for v in r.get("exam_dates", [])]
+    dates = [d for d in dates if d is not None]
+    return max(dates) if dates else None
@@ -0,0 +1,227 @@
+import os
+import time
+import collections
+import multiprocessing
+from multiprocessing.connection import wait
+
+from .pdf_reader import read_text, extract_text, extract_cached_text
+from .pdf_cache import get_outline, file_digest
+from .pdf_outline import format_chapter_table
+from . import tracing
+from .tracing import span, count
+
+# Multi-core PDF extraction. pypdf is pure-Python and holds the GIL, so big folders are fanned out over
+# worker processes instead of threads. Each file gets a wall-clock timeout and each worker an RSS cap:
+# a scanned or malformed PDF that hangs or balloons gets its worker killed (and replaced), and the file is
+# skipped with a recorded error instead of stalling the planner.
+# A job can also ask for the document's outline (chapter table): it is read in the same worker, under the same
+# timeout and memory cap, and when there is one the job's smaller outline text budget applies instead.
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+PDF_EXTRACT_TIMEOUT_SECONDS = float(os.getenv("PDF_EXTRACT_TIMEOUT_SECONDS", "60"))
+PDF_EXTRACT_MAX_MB = int(os.getenv("PDF_EXTRACT_MAX_MB", "1024"))
+
+# Below this many uncached files one worker is enough: starting more costs more than it saves, but every file
+# still runs under the timeout and memory cap. PDF_EXTRACT_WORKERS=0 reads in-process, with no limits.
+POOL_MIN_FILES = int(os.getenv("PDF_POOL_MIN_FILES", "8"))
+POLL_INTERVAL = 0.1
+# A file whose worker dies this many times is skipped (once may be the OS reclaiming memory from a healthy read)
+MAX_CRASHES_PER_FILE = 2
+
+# (path, content digest) -> reason, for every file skipped during this process's lifetime.
+# Keyed by content too, so a file that is fixed or replaced under the same name is tried again.
+extraction_errors = {}
+
+
+# Returns (chapter table or None, text). outline_budget=None skips the outline.
+def _read_document(path, char_budget, max_pages, outline_budget):
+    table = format_chapter_table(path) if outline_budget is not None else None
+    return table, read_text(path, outline_budget if table else char_budget, max_pages)
+
+
+# Same, but only from the caches (no PDF is opened): None when the outline or a needed page isn't cached yet
+def _cached_document(path, char_budget, max_pages, outline_budget):
+    table = None
+    if outline_budget is not None:
+        if get_outline(path) is None:
+            return None
+        table = format_chapter_table(path)
+    text = extract_cached_text(path, outline_budget if table else char_budget, max_pages)
+    return None if text is None else (table, text)
+
+
+def _worker_main(conn):
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        index, path, char_budget, max_pages, outline_budget = job
+        tracing.reset()
+        try:
+            document, error = _read_document(path, char_budget, max_pages, outline_budget), None
+        except Exception as e:
+            document, error = (None, ""), f"{type(e).__name__}: {e}"
+        conn.send((index, document, error, tracing.snapshot()[1]))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.started = None
+
+    def submit(self, job):
+        self.job = job
+        self.started = time.monotonic()
+        self.conn.send(job)
+
+    # Resident memory in MB, read from /proc (None where that isn't available)
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _error_key(path):
+    try:
+        return path, file_digest(path)
+    except OSError:
+        return path, None
+
+
+def _record_error(path, reason, counter):
+    extraction_errors[_error_key(path)] = reason
+    count(counter)
+    print(f"    ⚠️  Skipping '{os.path.basename(path)}': {reason}")
+
+
+# Runs the jobs on worker processes. Returns the jobs it could NOT run, which only happens when no worker
+# process can be started at all (before any file was handed to one).
+def _run_pool(jobs, results, max_workers, timeout, max_mb):
+    ctx = multiprocessing.get_context("spawn")
+    pending = collections.deque(jobs)
+    idle = []
+    busy = {}
+    crashes = collections.Counter()
+
+    try:
+        try:
+            for _ in range(min(max_workers, len(jobs))):
+                idle.append(_Worker(ctx))
+        except OSError as e:
+            if not idle:
+                print(f"    ⚠️  Could not start a PDF extraction worker ({e}).")
+                return list(jobs)
+
+        while pending or busy:
+            while pending and idle:
+                worker = idle.pop()
+                worker.submit(pending.popleft())
+                busy[worker.conn] = worker
+
+            for conn in wait(list(busy), timeout=POLL_INTERVAL):
+                worker = busy.pop(conn)
+                path = worker.job[1]
+                try:
+                    index, document, error, counters = conn.recv()
+                except (EOFError, OSError):
+                    # The worker died mid-file (e.g. killed by the OS for running out of memory). The file gets
+                    # another worker; if it kills that one too it is skipped, never retried in this process.
+                    worker.kill()
+                    count("pdf.worker_crashes")
+                    crashes[path] += 1
+                    if crashes[path] < MAX_CRASHES_PER_FILE:
+                        pending.appendleft(worker.job)
+                    else:
+                        _record_error(path, f"extraction process crashed {crashes[path]} times", "pdf.errors")
+                    idle.append(_Worker(ctx))
+                    continue
+
+                results[index] = document
+                for name, value in counters.items():
+                    count(name, value)
+                if error:
+                    _record_error(path, error, "pdf.errors")
+                idle.append(worker)
+
+            now = time.monotonic()
+            for conn, worker in list(busy.items()):
+                path = worker.job[1]
+                rss = worker.rss_mb() if max_mb else None
+                if timeout and now - worker.started > timeout:
+                    reason, counter = f"timed out after {timeout:.0f}s", "pdf.timeouts"
+                elif rss is not None and rss > max_mb:
+                    reason, counter = f"used more than {max_mb} MB", "pdf.memory_kills"
+                else:
+                    continue
+                del busy[conn]
+                worker.kill()
+                _record_error(path, reason, counter)
+                idle.append(_Worker(ctx))
+        return []
+    finally:
+        for worker in idle:
+            worker.stop()
+        for worker in busy.values():
+            worker.kill()
+
+
+# Extracts many files at once. jobs is a list of (pdf_path, char_budget, max_pages); returns their texts in
+# the same order ("" for skipped files). Cached files never reach a worker; small batches stay in-process.
+def extract_many(jobs, max_workers=None, timeout=None, max_mb=None):
+    jobs = [(path, char_budget, max_pages, None) for path, char_budget, max_pages in jobs]
+    return [text for _, text in extract_documents(jobs, max_workers, timeout, max_mb)]
+
+
+# Like extract_many, but jobs are (pdf_path, char_budget, max_pages, outline_budget) and the results are
+# (chapter table or None, text) pairs. Documents with an outline are read up to outline_budget characters.
+def extract_documents(jobs, max_workers=None, timeout=None, max_mb=None):
+    max_workers = PDF_EXTRACT_WORKERS if max_workers is None else max_workers
+    timeout = PDF_EXTRACT_TIMEOUT_SECONDS if timeout is None else timeout
+    max_mb = PDF_EXTRACT_MAX_MB if max_mb is None else max_mb
+
+    results = [(None, "")] * len(jobs)
+    uncached = []
+    for index, (path, char_budget, max_pages, outline_budget) in enumerate(jobs):
+        if _error_key(path) in extraction_errors:
+            continue
+        document = _cached_document(path, char_budget, max_pages, outline_budget)
+        if document is None:
+            uncached.append((index, path, char_budget, max_pages, outline_budget))
+        else:
+            results[index] = document
+
+    if not uncached:
+        return results
+
+    if max_workers > 0:
+        workers = min(max_workers, len(uncached)) if len(uncached) >= POOL_MIN_FILES else 1
+        with span("pdf.extract_pool", "pdf", files=len(uncached), workers=workers):
+            uncached = _run_pool(uncached, results, workers, timeout, max_mb)
+        if uncached:
+            print("    ⚠️  PDF extraction workers failed to start. Reading files in-process instead.")
+
+    for index, path, char_budget, max_pages, outline_budget in uncached:
+        table = format_chapter_table(path) if outline_budget is not None else None
+        results[index] = table, extract_text(path, outline_budget if table else char_budget, max_pages)
+    return results
+
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+from .pdf_cache import CACHE_DIR
+from .rate_limit import gemini_limiter, is_rate_limit_error
+from .tracing import span, count
+
+# Persistent cache of Gemini responses, shared by all four agents.
+# Key = model name + generation config + normalised prompt, so an identical re-run costs nothing.
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_responses.sqlite3")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("PLANNER_LLM_CACHE_TTL_HOURS", "168")) * 3600
+LLM_CACHE_MAX_BYTES = int(os.getenv("PLANNER_LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Per-agent bypass, e.g. PLANNER_LLM_CACHE_BYPASS="agent3,agent4" (or "all")
+BYPASS_AGENTS = {a.strip() for a in os.getenv("PLANNER_LLM_CACHE_BYPASS", "").split(",") if a.strip()}
+
+# Expired rows are purged every N writes rather than on every single insert
+EVICT_EVERY_N_WRITES = 50
+
+_conn = None
+_lock = threading.Lock()
+_writes_since_evict = 0
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(LLM_CACHE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                agent TEXT,
+                response TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_used REAL
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+
+# Whitespace differences (indentation of the f-string prompts, trailing spaces) shouldn't cause misses
+def normalize_prompt(prompt):
+    return "\n".join(" ".join(line.split()) for line in prompt.strip().splitlines() if line.strip())
+
+
+def cache_key(model_name, generation_config, prompt):
+    payload = json.dumps([model_name, generation_config or {}, normalize_prompt(prompt)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_bypassed(agent):
+    return "all" in BYPASS_AGENTS or agent in BYPASS_AGENTS
+
+
+def get_response(key):
+    with _lock:
+        conn = _connection()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        response, created_at = row
+        now = time.time()
+        if now - created_at > LLM_CACHE_TTL_SECONDS:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return response
+
+
+def store_response(key, agent, response):
+    global _writes_since_evict
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, agent, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, agent, response, len(response.encode("utf-8")), now, now)
+        )
+        conn.commit()
+        _writes_since_evict += 1
+        if _writes_since_evict >= EVICT_EVERY_N_WRITES:
+            _writes_since_evict = 0
+            _evict_locked(conn)
+
+
+# Drops expired rows, then the least recently used ones until the cache fits in LLM_CACHE_MAX_BYTES
+def _evict_locked(conn):
+    conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - LLM_CACHE_TTL_SECONDS,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total > LLM_CACHE_MAX_BYTES:
+        removed_keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+            if total <= LLM_CACHE_MAX_BYTES:
+                break
+            removed_keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", removed_keys)
+    conn.commit()
+
+
+def evict():
+    with _lock:
+        _evict_locked(_connection())
+
+
+def clear(agent=None):
+    with _lock:
+        conn = _connection()
+        if agent:
+            cursor = conn.execute("DELETE FROM responses WHERE agent = ?", (agent,))
+        else:
+            cursor = conn.execute("DELETE FROM responses")
+        conn.commit()
+        return cursor.rowcount
+
+
+# Copies token counts from the response metadata (when the SDK provides them) onto the trace span
+def _record_usage(attrs, response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for field in ("prompt_token_count", "candidates_token_count", "total_token_count"):
+        value = getattr(usage, field, None)
+        if value is not None:
+            attrs[field] = value
+            count(f"llm.{field}", value)
+
+
+# Drop-in replacement for model.generate_content(...).text that goes through the cache.
+# 'validator' (e.g. json.loads) is run on fresh responses; if it raises, the response is NOT cached,
+# so one garbled answer doesn't get replayed on every future run.
+def cached_generate_content(model, prompt, agent, generation_config=None, validator=None, use_cache=True):
+    use_cache = use_cache and not is_bypassed(agent)
+    key = None
+
+    if use_cache:
+        model_name = getattr(model, "model_name", type(model).__name__)
+        effective_config = {
+            "model": getattr(model, "_generation_config", None),
+            "call": generation_config,
+        }
+        key = cache_key(model_name, effective_config, prompt)
+        cached = get_response(key)
+        if cached is not None:
+            count("llm.cache_hit")
+            return cached
+        count("llm.cache_miss")
+
+    # Only real network calls spend rate-limit tokens
+    with span("llm.rate_limit_wait", "llm", agent=agent):
+        gemini_limiter.acquire()
+
+    with span("llm.generate", "llm", agent=agent, prompt_chars=len(prompt)) as attrs:
+        try:
+            if generation_config is not None:
+                response = model.generate_content(prompt, generation_config=generation_config)
+            else:
+                response = model.generate_content(prompt)
+            text = response.text
+        except Exception as e:
+            if is_rate_limit_error(e):
+                count("llm.429")
+            raise
+        attrs["response_chars"] = len(text)
+        _record_usage(attrs, response)
+    count(f"llm.calls.{agent}")
+
+    if use_cache:
+        try:
+            if validator is not None:
+                validator(text)
+            store_response(key, agent, text)
+        except Exception:
+            pass
+    return text
+
+
+# Usage: python -m planner_agent.llm_cache --clear [--agent agent3]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the Gemini response cache.")
+    parser.add_argument("--clear", action="store_true", help="Delete cached responses.")
+    parser.add_argument("--agent", help="Only clear responses from this agent (agent1..agent4).")
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = clear(args.agent)
+        print(f"🗑️  Removed {removed} cached response(s) from '{LLM_CACHE_PATH}'.")
+        sys.exit(0)
+
+    with _lock:
+        entries, size = _connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    print(f"📦 {entries} cached response(s), {size / 1024:.1f} KB in '{LLM_CACHE_PATH}'.")
@@ -0,0 +1,65 @@
+import os
+import threading
+
+# Lazily-initialised Gemini client registry shared by all four agents.
+# The google.generativeai / grpc / protobuf stack is only imported (and configured, once) when the first
+# agent actually needs a model, so importing the planner, printing the banner, or running fully cached
+# never pays for it. All models share the SDK's single configured client and its connection pool.
+
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+
+# Per-agent generation configs (None = SDK defaults)
+AGENT_GENERATION_CONFIGS = {
+    "agent1": None,
+    "agent2": {"response_mime_type": "application/json"},
+    "agent3": None,
+    "agent4": {"response_mime_type": "application/json"},
+}
+
+_genai = None
+_models = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def _configure():
+    global _genai
+    if _genai is None:
+        from dotenv import load_dotenv
+        import google.generativeai as genai
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if api_key:
+            genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
+
+def get_model(agent):
+    if agent in _overrides:
+        return _overrides[agent]
+
+    with _lock:
+        if agent not in _models:
+            genai = _configure()
+            config = AGENT_GENERATION_CONFIGS.get(agent)
+            if config:
+                _models[agent] = genai.GenerativeModel(model_name=MODEL_NAME, generation_config=config)
+            else:
+                _models[agent] = genai.GenerativeModel(MODEL_NAME)
+        return _models[agent]
+
+
+# Swaps in a stand-in model (e.g. a local fake for benchmarks). agent="all" covers all four agents.
+def set_model_override(agent, model):
+    agents = AGENT_GENERATION_CONFIGS.keys() if agent == "all" else [agent]
+    for name in agents:
+        if model is None:
+            _overrides.pop(name, None)
+        else:
+            _overrides[name] = model
+
+
+def clear_model_overrides():
+    _overrides.clear()
@@ -0,0 +1,115 @@
+import os
+import re
+import functools
+from collections import Counter
+
+from .tracing import span, count
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional: without it every unmatched file goes to Gemini as before
+    np = None
+
+# Local pre-classifier for Agent 1. Each course gets a profile built from its topic summary (from
+# find_syllabus_courses) plus the files already matched to it by name or course code; every unmatched file
+# snippet is scored against every profile at once (TF-IDF over word character n-grams, cosine similarity as
+# one NumPy matrix product). A file is assigned locally only when its best course beats the runner-up by a
+# clear margin; the ambiguous rest still goes to Gemini.
+
+SORTER_LOCAL_CLASSIFIER = os.getenv("SORTER_LOCAL_CLASSIFIER", "1") != "0"
+# Best cosine score must beat the second best by this much (0..1); higher = fewer local assignments
+SORTER_LOCAL_MARGIN = float(os.getenv("SORTER_LOCAL_MARGIN", "0.15"))
+# ...and be at least this high, so a file unlike every course (a recipe) isn't assigned to the least-unlike one
+SORTER_LOCAL_MIN_SCORE = float(os.getenv("SORTER_LOCAL_MIN_SCORE", "0.2"))
+
+NGRAM_SIZES = (3, 4, 5)
+WORD_PATTERN = re.compile(r"[a-z]{3,}")
+
+
+def available():
+    return np is not None and SORTER_LOCAL_CLASSIFIER
+
+
+# "integrals" -> the word plus the 3/4/5-character pieces of " integrals ", so "integral" and "integration" still overlap
+@functools.lru_cache(maxsize=65536)
+def _word_grams(word):
+    padded = f" {word} "
+    return (word,) + tuple(padded[i:i + size] for size in NGRAM_SIZES for i in range(len(padded) - size + 1))
+
+
+# Documents repeat the same few hundred words, so grams are expanded once per distinct word
+def _ngrams(text):
+    grams = Counter()
+    for word, n in Counter(WORD_PATTERN.findall(text.lower())).items():
+        for g in _word_grams(word):
+            grams[g] += n
+    return grams
+
+
+# Rows of L2-normalised, sublinear TF-IDF vectors over vocab ({gram: column}); grams outside vocab are ignored
+def _tfidf(counters, vocab, idf):
+    matrix = np.zeros((len(counters), len(vocab)), dtype=np.float32)
+    for row, grams in enumerate(counters):
+        hits = [(vocab[g], n) for g, n in grams.items() if g in vocab]
+        if hits:
+            columns, counts = zip(*hits)
+            matrix[row, list(columns)] = counts
+    present = matrix > 0
+    np.log(matrix, out=matrix, where=present)
+    matrix[present] += 1.0  # sublinear tf: 1 + log(count)
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+# texts: snippets of the unmatched files. course_context_map: {course: topic summary}.
+# seeds: {course: [snippets of files already known to belong to it]}.
+# Returns one course (or None when it's too close to call) per text.
+def classify_snippets(texts, course_context_map, seeds=None):
+    courses = list(course_context_map)
+    if not available() or not texts or not courses:
+        return [None] * len(texts)
+    seeds = seeds or {}
+
+    with span("agent1.local_classify", files=len(texts), courses=len(courses)) as attrs:
+        summaries = [_ngrams(f"{course} {course_context_map[course]}") for course in courses]
+        seed_grams = [_ngrams(" ".join(seeds.get(course, []))) for course in courses]
+        files = [_ngrams(text) for text in texts]
+
+        # Only grams that occur in some course profile can contribute to a similarity, so the vocabulary
+        # (and the matrices) stay the size of the profiles, not of every snippet
+        vocab = {}
+        for grams in summaries + seed_grams:
+            for g in grams:
+                vocab.setdefault(g, len(vocab))
+        if not vocab:
+            return [None] * len(texts)
+
+        # Document frequency over every profile part and snippet
+        df = np.zeros(len(vocab), dtype=np.float32)
+        for grams in summaries + seed_grams + files:
+            columns = [vocab[g] for g in grams if g in vocab]
+            if columns:
+                df[columns] += 1
+        idf = (np.log((1 + len(summaries + seed_grams + files)) / (1 + df)) + 1).astype(np.float32)
+
+        # A course profile is its summary and its known files, weighted equally (a long seed shouldn't drown the summary)
+        profiles = _tfidf(summaries, vocab, idf) + _tfidf(seed_grams, vocab, idf)
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        profiles /= np.where(norms > 0, norms, 1.0)
+
+        scores = _tfidf(files, vocab, idf) @ profiles.T
+        if len(courses) > 1:
+            top_two = np.sort(scores, axis=1)[:, -2:]
+            best, runner_up = top_two[:, 1], top_two[:, 0]
+        else:
+            best, runner_up = scores[:, 0], np.zeros(len(texts), dtype=np.float32)
+        confident = (best >= SORTER_LOCAL_MIN_SCORE) & (best - runner_up >= SORTER_LOCAL_MARGIN)
+        picks = scores.argmax(axis=1)
+
+        result = [courses[picks[i]] if confident[i] else None for i in range(len(texts))]
+        assigned = int(confident.sum())
+        attrs["assigned"] = assigned
+        count("agent1.local_assigned", assigned)
+        count("agent1.local_deferred", len(texts) - assigned)
+    return result
@@ -0,0 +1,389 @@
+import re
+import datetime
+
+from .schedule_model import ScheduleModel
+from .schedule_validator import parse_days_off
+
+# Deterministic local scheduling engine for Agent 3.
+# Takes Agent 2's topic list and lays study blocks around the biological skeleton (sleep, routine, meals)
+# in milliseconds, instead of asking the LLM to write every day of the plan as one giant JSON blob.
+
+DEFAULT_WAKE = 7 * 60           # 07:00
+DEFAULT_SLEEP = 23 * 60         # 23:00
+ROUTINE_MINUTES = 60
+LUNCH = (12 * 60, 13 * 60)
+DINNER = (18 * 60, 19 * 60)
+
+DAILY_STUDY_CAP = 10 * 60       # Burnout cap (the auditor rejects anything above this)
+OVERLOAD_STUDY_CAP = 9 * 60     # "Safety Valve" cap when the workload is impossible anyway
+MAX_BLOCK = 120                 # Split big tasks: no study block longer than 2 hours
+MIN_BLOCK = 30
+BREAK_MINUTES = 15
+REVIEW_BUFFER_DAYS = 2          # Last 48 hours are Review Only
+REVIEW_BLOCK = 90
+
+WAKE_PATTERN = re.compile(r"wake(?:\s*up)?\s*(?:at\s*)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", re.IGNORECASE)
+ISO_DATE_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+SLEEP_PATTERN = re.compile(r"(?:sleep|bed(?:time)?)\s*(?:at\s*|by\s*)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?", re.IGNORECASE)
+
+
+def _to_minutes(hour, minute, meridiem):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if meridiem:
+        meridiem = meridiem.lower()
+        if meridiem == "pm" and hour != 12:
+            hour += 12
+        elif meridiem == "am" and hour == 12:
+            hour = 0
+    return hour * 60 + minute
+
+
+# Picks out the handful of constraints the local engine understands ("Wake up 10am", "Sleep at 1am", "No Fridays").
+# Anything fuzzier is left to the auditor's constraint check.
+def parse_constraints(user_constraints):
+    text = user_constraints or ""
+    wake = DEFAULT_WAKE
+    sleep = DEFAULT_SLEEP
+
+    match = WAKE_PATTERN.search(text)
+    if match:
+        wake = _to_minutes(*match.groups())
+
+    match = SLEEP_PATTERN.search(text)
+    if match:
+        sleep = _to_minutes(*match.groups())
+        # "Sleep at 1am" means after midnight, not before breakfast
+        if sleep <= wake:
+            sleep += 24 * 60
+
+    return {"wake": wake, "sleep": sleep, "days_off": parse_days_off(text)}
+
+
+def _free_intervals(wake, sleep):
+    # Study only happens between the end of the morning routine and bedtime (never past midnight)
+    day_start = wake + ROUTINE_MINUTES
+    day_end = min(sleep, 24 * 60)
+
+    intervals = []
+    cursor = day_start
+    for meal_start, meal_end in sorted([LUNCH, DINNER]):
+        if meal_end <= cursor or meal_start >= day_end:
+            continue
+        if meal_start > cursor:
+            intervals.append([cursor, meal_start])
+        cursor = max(cursor, meal_end)
+    if cursor < day_end:
+        intervals.append([cursor, day_end])
+    return intervals
+
+
+def _skeleton_events(wake, sleep):
+    events = [(wake, wake + ROUTINE_MINUTES, "Morning Routine", "personal")]
+    for (start, end), label in ((LUNCH, "LUNCH"), (DINNER, "DINNER")):
+        if start >= wake + ROUTINE_MINUTES and end <= sleep:
+            events.append((start, end, label, "meal"))
+    return events
+
+
+# Turns Agent 2's output into per-course queues of work chunks (minutes), in topic order
+def _build_work_queues(all_course_data):
+    queues = {}
+    for course_entry in all_course_data:
+        analysis = course_entry['analysis']
+        if isinstance(analysis, list): analysis = analysis[0]
+
+        chunks = []
+        for t in analysis.get('topics', []):
+            minutes = int(round(float(t.get('est_hours', 1) or 0) * 60 / MIN_BLOCK)) * MIN_BLOCK
+            if minutes <= 0:
+                continue
+            chunks.append({
+                "topic": t.get('topic', 'Study'),
+                "minutes": minutes,
+                "high_focus": bool(t.get('high_focus')),
+            })
+        queues[course_entry['course']] = chunks
+    return queues
+
+
+def _remaining(queue):
+    return sum(c["minutes"] for c in queue)
+
+
+# Chooses the next course to study: a course that hasn't had a block yet (so small courses aren't starved when
+# the plan is overloaded), else the one with the most work left, never the same course twice in a row
+# (interleaving), and High Focus work first while it's still morning.
+def _pick_course(queues, last_course, cursor, untouched=()):
+    candidates = [c for c, q in queues.items() if q]
+    if not candidates:
+        return None
+    fresh = [c for c in candidates if c in untouched]
+    if fresh:
+        candidates = fresh
+    if len(candidates) > 1 and last_course in candidates:
+        candidates.remove(last_course)
+    if cursor < LUNCH[0]:
+        focused = [c for c in candidates if queues[c][0]["high_focus"]]
+        if focused:
+            candidates = focused
+    return max(candidates, key=lambda c: _remaining(queues[c]))
+
+
+# untouched (optional) is the set of courses that haven't had a block yet; placed courses are removed from it
+def _place_study_day(queues, intervals, budget, untouched=None):
+    untouched = set() if untouched is None else untouched
+    placed = []
+    last_course = None
+    for interval in intervals:
+        cursor, end = interval
+        while budget >= MIN_BLOCK and end - cursor >= MIN_BLOCK:
+            course = _pick_course(queues, last_course, cursor, untouched)
+            if course is None:
+                return placed
+            chunk = queues[course][0]
+            length = min(chunk["minutes"], MAX_BLOCK, budget, end - cursor)
+            length -= length % MIN_BLOCK
+            if length < MIN_BLOCK:
+                break
+
+            placed.append((cursor, cursor + length, f"{course}: {chunk['topic']}", "study"))
+            chunk["minutes"] -= length
+            untouched.discard(course)
+            if chunk["minutes"] <= 0:
+                queues[course].pop(0)
+            budget -= length
+            cursor += length + BREAK_MINUTES
+            last_course = course
+    return placed
+
+
+# start_index carries the course rotation over from the previous review day, so every course gets reviewed
+def _place_review_day(courses, intervals, cap, start_index=0):
+    placed = []
+    budget = cap
+    course_index = start_index
+    for cursor, end in intervals:
+        while courses and budget >= MIN_BLOCK and end - cursor >= MIN_BLOCK:
+            length = min(REVIEW_BLOCK, budget, end - cursor)
+            length -= length % MIN_BLOCK
+            course = courses[course_index % len(courses)]
+            placed.append((cursor, cursor + length, f"Review: {course} (practice problems & weak spots)", "review"))
+            course_index += 1
+            budget -= length
+            cursor += length + BREAK_MINUTES
+    return placed
+
+
+def build_local_schedule(all_course_data, start_date, end_date, user_constraints="None"):
+    try:
+        start_dt = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+        end_dt = datetime.datetime.strptime(end_date, "%Y-%m-%d").date()
+        days_available = (end_dt - start_dt).days + 1
+    except ValueError:
+        start_dt = datetime.date.today()
+        days_available = 14 # Fallback default
+    days_available = max(1, days_available)
+
+    prefs = parse_constraints(user_constraints)
+    queues = _build_work_queues(all_course_data)
+    courses = list(queues.keys())
+    intervals = _free_intervals(prefs["wake"], prefs["sleep"])
+
+    dates = [start_dt + datetime.timedelta(days=i) for i in range(days_available)]
+    review_days = REVIEW_BUFFER_DAYS if days_available > REVIEW_BUFFER_DAYS else 0
+    study_dates = [d for d in dates[:days_available - review_days] if d.strftime("%A").lower() not in prefs["days_off"]]
+
+    total_minutes = sum(_remaining(q) for q in queues.values())
+    overloaded = total_minutes > OVERLOAD_STUDY_CAP * max(1, len(study_dates))
+    cap = OVERLOAD_STUDY_CAP if overloaded else DAILY_STUDY_CAP
+    if overloaded:
+        print(f"    ⚠️  Workload Alert: {total_minutes / 60:.1f}h over {len(study_dates)} study days. Capping at {cap // 60}h/day.")
+        # Triage: High Focus work goes first when not everything fits
+        for course in courses:
+            queues[course].sort(key=lambda c: not c["high_focus"])
+
+    model = ScheduleModel(courses)
+    untouched = set(courses)
+    review_courses = None
+    review_index = 0
+    # Review days get the full cap too when the plan is overloaded (every hour counts then)
+    review_cap = cap if overloaded else min(cap, 6 * 60)
+    study_days_left = len(study_dates)
+    for index, day in enumerate(dates):
+        day_name = day.strftime("%A")
+        events = _skeleton_events(prefs["wake"], prefs["sleep"])
+
+        if day_name.lower() in prefs["days_off"]:
+            pass # Day off: skeleton only
+        elif index >= days_available - review_days:
+            if review_courses is None:
+                # Courses that never got a study block are reviewed first
+                review_courses = sorted(courses, key=lambda c: c not in untouched)
+            review = _place_review_day(review_courses, [list(i) for i in intervals], review_cap, review_index)
+            review_index += len(review)
+            events += review
+        elif day in study_dates:
+            # Spread what's left evenly over the remaining study days (rounded up to whole blocks)
+            remaining = sum(_remaining(q) for q in queues.values())
+            target = -(-remaining // max(1, study_days_left))
+            target = min(cap, -(-target // MIN_BLOCK) * MIN_BLOCK)
+            events += _place_study_day(queues, [list(i) for i in intervals], target, untouched)
+            study_days_left -= 1
+
+        events.sort(key=lambda e: e[0])
+        model.add_day(day.strftime("%Y-%m-%d"), day_name)
+        for start, end, task, kind in events:
+            model.add_event(start, end, task, kind)
+        model.add_event(prefs["sleep"], prefs["sleep"], "SLEEP", "personal")
+
+    # Repair pass: anything the even spread couldn't fit goes into leftover capacity, earliest day first
+    leftover = sum(_remaining(q) for q in queues.values())
+    if leftover:
+        study_days = {i for i, d in enumerate(dates) if d in study_dates}
+        model = _repair_leftovers(model, queues, study_days, intervals, cap, untouched=untouched)
+        leftover = sum(_remaining(q) for q in queues.values())
+
+    result = model.to_json()
+    if leftover:
+        unscheduled = {c: round(_remaining(q) / 60, 1) for c, q in queues.items() if q}
+        print(f"    ⚠️  Local Scheduler: {leftover / 60:.1f}h did not fit under the {cap // 60}h/day cap: {unscheduled}")
+        result["unscheduled_hours"] = unscheduled
+    return result
+
+
+# Fills free capacity on the given study days (day indices) from the queues. Returns the rebuilt model.
+def _repair_leftovers(model, queues, study_days, intervals, cap, spread=False, untouched=None):
+    work = model.work_mask()
+    days_left = len(study_days)
+    extra_events = {}
+    for day in range(model.n_days):
+        if day not in study_days or not any(queues.values()):
+            continue
+        days_left -= 1
+
+        busy = []
+        used = 0
+        for row in model.rows(day):
+            if not model.is_timed(row):
+                continue
+            start, end = model.start[row], model.end[row]
+            if work[row]:
+                used += end - start
+                end += BREAK_MINUTES
+            busy.append((start, end))
+        budget = cap - used
+        if spread:
+            # Share what's left across the remaining days instead of piling it onto the first one
+            remaining = sum(_remaining(q) for q in queues.values())
+            share = -(-remaining // (days_left + 1))
+            budget = min(budget, -(-share // MIN_BLOCK) * MIN_BLOCK)
+        if budget < MIN_BLOCK:
+            continue
+
+        # Free time inside the study windows that isn't already taken
+        gaps = []
+        for i_start, i_end in intervals:
+            cursor = i_start
+            for b_start, b_end in sorted(busy):
+                if b_end <= cursor or b_start >= i_end:
+                    continue
+                if b_start > cursor:
+                    gaps.append([cursor, b_start])
+                cursor = max(cursor, b_end)
+            if cursor < i_end:
+                gaps.append([cursor, i_end])
+
+        extra = _place_study_day(queues, gaps, budget, untouched)
+        if extra:
+            extra_events[day] = extra
+
+    # New blocks are merged into their days by start time; point-in-time events (e.g. SLEEP) stay at the end
+    return model.rebuild(extra_events=extra_events) if extra_events else model
+
+
+# Days a free-text constraint violation points at: the plan dates it mentions, or the weekdays it names
+def _constraint_days(model, message):
+    text = str(message).lower()
+    dates = set(ISO_DATE_PATTERN.findall(text))
+    return {d for d in range(model.n_days) if model.dates[d] in dates or str(model.day_names[d]).lower() in text}
+
+
+# Incremental repair: fixes only the days and courses named in the auditor's violations.
+# Overloaded or night-time days get their excess work dropped, and days named in a broken user constraint are
+# unpinned: all their work moves elsewhere. Then every course that is now short of its Agent 2 estimate is
+# topped up in the free capacity of the other days. Approved days keep their events.
+def repair_schedule_locally(schedule_data, violations, all_course_data, user_constraints="None"):
+    prefs = parse_constraints(user_constraints)
+    intervals = _free_intervals(prefs["wake"], prefs["sleep"])
+    night_owl = "night owl" in str(user_constraints).lower()
+
+    queues = _build_work_queues(all_course_data)
+    courses = list(queues.keys())
+    model = ScheduleModel.from_json(schedule_data, courses)
+    work = model.work_mask()
+    review_days = REVIEW_BUFFER_DAYS if model.n_days > REVIEW_BUFFER_DAYS else 0
+
+    unpinned = set()
+    for violation in violations:
+        if violation.code != "user_constraint":
+            continue
+        days = _constraint_days(model, violation.message)
+        # No day to point at, or a review day (top-ups only refill study days): re-solve the whole plan locally
+        if not days or any(d >= model.n_days - review_days for d in days):
+            result = build_local_schedule(all_course_data, model.dates[0], model.dates[-1], user_constraints)
+            return {**{k: v for k, v in schedule_data.items() if k != "unscheduled_hours"}, **result}
+        unpinned |= days
+
+    bad_dates = {v.date for v in violations if v.date}
+    dropped = set()
+    for day in range(model.n_days):
+        if day in unpinned:
+            dropped.update(r for r in model.rows(day) if work[r] and model.is_timed(r))
+            continue
+        if model.dates[day] not in bad_dates:
+            continue
+        used = 0
+        kept_spans = []
+        # Earliest block first, so of two overlapping blocks the later one is dropped (and re-placed by the top-up)
+        for row in sorted(model.rows(day), key=lambda r: model.start[r]):
+            if not work[row] or not model.is_timed(row):
+                continue
+            start, end = model.start[row], model.end[row]
+            at_night = not night_owl and (start < 6 * 60 or end > 24 * 60)
+            overlapping = any(start < k_end and end > k_start for k_start, k_end in kept_spans)
+            if at_night or overlapping or used + (end - start) > DAILY_STUDY_CAP:
+                dropped.add(row)
+                continue
+            used += end - start
+            kept_spans.append((start, end))
+    if dropped:
+        model = model.rebuild(keep=lambda row: row not in dropped)
+
+    # Work out how far behind each course is, then queue up the topics it hasn't covered yet
+    scheduled = dict(zip(courses, model.course_minutes("study")))
+    for course, queue in queues.items():
+        done = scheduled[course]
+        while queue and done > 0:
+            if queue[0]["minutes"] <= done:
+                done -= queue.pop(0)["minutes"]
+            else:
+                queue[0]["minutes"] -= done - done % MIN_BLOCK
+                done = 0
+    untouched = {c for c in courses if not scheduled[c]}
+
+    # Top-ups go on any non-review, non-day-off date that wasn't just unpinned
+    study_days = {
+        day for day in range(model.n_days - review_days)
+        if str(model.day_names[day]).lower() not in prefs["days_off"] and day not in unpinned
+    }
+    model = _repair_leftovers(model, queues, study_days, intervals, DAILY_STUDY_CAP, spread=True, untouched=untouched)
+
+    result = dict(schedule_data)
+    result["schedule"] = model.to_json()["schedule"]
+    leftover = {c: round(_remaining(q) / 60, 1) for c, q in queues.items() if q}
+    if leftover:
+        result["unscheduled_hours"] = leftover
+    else:
+        result.pop("unscheduled_hours", None)
+    return result
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+import argparse
+
+# On-disk cache for extracted PDF text, shared by every agent and every run.
+# Entries are keyed by the SHA-256 of the file CONTENT plus the page range, so renaming
+# or moving a file still hits the cache while editing it naturally misses.
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+CACHE_DIR = os.getenv("PLANNER_CACHE_DIR", os.path.join(REPO_ROOT, ".planner_cache"))
+PDF_CACHE_DIR = os.path.join(CACHE_DIR, "pdf_text")
+MAX_CACHE_BYTES = int(os.getenv("PLANNER_PDF_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Scanning the cache directory isn't free either, so eviction only runs every N writes
+EVICT_EVERY_N_STORES = 64
+_stores_since_evict = 0
+
+# Hashing a 100MB textbook is not free, so remember digests for files whose size/mtime haven't changed
+_digest_memo = {}
+
+
+def file_digest(pdf_path):
+    stat = os.stat(pdf_path)
+    memo_key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _digest_memo:
+        return _digest_memo[memo_key]
+
+    sha = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    _digest_memo[memo_key] = digest
+    return digest
+
+
+def _entry_path(digest, first_page, last_page):
+    return os.path.join(PDF_CACHE_DIR, f"{digest}_{first_page}-{last_page}.txt")
+
+
+# Returns the cached text for pages [first_page, last_page) or None on a miss
+def get_cached_text(pdf_path, first_page, last_page):
+    try:
+        path = _entry_path(file_digest(pdf_path), first_page, last_page)
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return None
+
+    # Touch the entry so eviction treats it as recently used (LRU by mtime)
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return text
+
+
+# Unique per process AND thread: concurrent planner sessions in one server write the same entries
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def store_text(pdf_path, first_page, last_page, text):
+    global _stores_since_evict
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        path = _entry_path(file_digest(pdf_path), first_page, last_page)
+
+        # Write to a temp file first so a crash (or a parallel reader) never sees half an entry
+        tmp_path = _tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"    Warning: Could not cache text for {pdf_path}: {e}")
+        return
+
+    _stores_since_evict += 1
+    if _stores_since_evict >= EVICT_EVERY_N_STORES:
+        _stores_since_evict = 0
+        evict()
+
+
+# The page count is stored as its own tiny entry so a fully cached document never has to be opened
+def get_page_count(pdf_path):
+    try:
+        with open(os.path.join(PDF_CACHE_DIR, f"{file_digest(pdf_path)}_count.txt"), "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def store_page_count(pdf_path, count):
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        path = os.path.join(PDF_CACHE_DIR, f"{file_digest(pdf_path)}_count.txt")
+        tmp_path = _tmp_path(path)
+        with open(tmp_path, "w") as f:
+            f.write(str(count))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+# Outline/bookmark index of a document (JSON), same lifetime rules as the text entries
+def get_outline(pdf_path):
+    try:
+        with open(os.path.join(PDF_CACHE_DIR, f"{file_digest(pdf_path)}_outline.txt"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store_outline(pdf_path, outline):
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        path = os.path.join(PDF_CACHE_DIR, f"{file_digest(pdf_path)}_outline.txt")
+        tmp_path = _tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(outline, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+# Per-document feature record (dates, course codes, document type) from planner_agent.doc_features
+def get_features(pdf_path):
+    try:
+        with open(os.path.join(PDF_CACHE_DIR, f"{file_digest(pdf_path)}_features.txt"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store_features(pdf_path, features):
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        path = os.path.join(PDF_CACHE_DIR, f"{file_digest(pdf_path)}_features.txt")
+        tmp_path = _tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(features, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _list_entries():
+    if not os.path.isdir(PDF_CACHE_DIR):
+        return []
+
+    entries = []
+    for name in os.listdir(PDF_CACHE_DIR):
+        if not name.endswith(".txt"):
+            continue
+        path = os.path.join(PDF_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+# Drops the least recently used entries until the cache fits in max_bytes
+def evict(max_bytes=None):
+    if max_bytes is None:
+        max_bytes = MAX_CACHE_BYTES
+
+    entries = _list_entries()
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# Removes cached text for the given PDFs (all page ranges), or the whole cache if no paths are given
+def invalidate(pdf_paths=None):
+    if pdf_paths:
+        prefixes = tuple(f"{file_digest(p)}_" for p in pdf_paths if os.path.exists(p))
+    else:
+        prefixes = None
+
+    removed = 0
+    for _, _, path in _list_entries():
+        if prefixes is not None and not os.path.basename(path).startswith(prefixes):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def cache_stats():
+    entries = _list_entries()
+    return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries), "max_bytes": MAX_CACHE_BYTES}
+
+
+# Usage: python -m planner_agent.pdf_cache --clear [file.pdf ...]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the PDF text extraction cache.")
+    parser.add_argument("--clear", action="store_true", help="Invalidate cached text (all files, or only the ones listed).")
+    parser.add_argument("files", nargs="*", help="PDF files to invalidate.")
+    args = parser.parse_args()
+
+    if args.clear:
+        count = invalidate(args.files)
+        print(f"🗑️  Removed {count} cached extraction(s) from '{PDF_CACHE_DIR}'.")
+        sys.exit(0)
+
+    stats = cache_stats()
+    print(f"📦 {stats['entries']} cached extraction(s), {stats['bytes'] / 1024:.1f} KB "
+          f"of {stats['max_bytes'] / (1024 * 1024):.0f} MB in '{PDF_CACHE_DIR}'.")
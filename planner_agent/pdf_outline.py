@@ -0,0 +1,91 @@
+import os
+
+from .pdf_reader import open_reader
+from .pdf_cache import get_outline, store_outline
+from .tracing import span, count
+
+# Table-of-contents index built from a PDF's outline (bookmarks).
+# Most textbooks ship one, with chapter titles and page numbers, so Agent 2 can get a compact chapter table
+# with real page counts per chapter instead of tens of thousands of characters of front-matter text.
+# The index is computed once per document content and cached next to the extracted text.
+
+OUTLINE_MAX_DEPTH = 2           # Chapters and their sections; deeper levels add tokens, not information
+OUTLINE_MAX_ENTRIES = 80
+MIN_OUTLINE_ENTRIES = 2         # A single bookmark isn't a table of contents
+
+
+def _flatten(reader, items, level, out):
+    for item in items:
+        if isinstance(item, list):
+            if level + 1 < OUTLINE_MAX_DEPTH:
+                _flatten(reader, item, level + 1, out)
+            continue
+        try:
+            page = reader.get_destination_page_number(item)
+        except Exception:
+            page = None
+        title = " ".join(str(getattr(item, "title", "") or "").split())
+        if title and page is not None and page >= 0:
+            out.append({"title": title, "level": level, "start_page": page})
+
+
+# Gives every entry an end page: the page before the next entry at the same or a higher level starts
+def _page_spans(entries, page_count):
+    for i, entry in enumerate(entries):
+        end = page_count - 1
+        for later in entries[i + 1:]:
+            if later["level"] <= entry["level"] and later["start_page"] > entry["start_page"]:
+                end = later["start_page"] - 1
+                break
+        entry["end_page"] = max(entry["start_page"], end)
+        entry["pages"] = entry["end_page"] - entry["start_page"] + 1
+    return entries
+
+
+def read_outline(pdf_path):
+    f = stream = None
+    with span("pdf.outline", "pdf", file=os.path.basename(pdf_path)) as attrs:
+        try:
+            f, stream, reader = open_reader(pdf_path)
+            page_count = len(reader.pages)
+            entries = []
+            _flatten(reader, reader.outline, 0, entries)
+        except Exception as e:
+            count("pdf.outline_errors")
+            attrs["error"] = str(e)
+            return {"page_count": None, "entries": []}
+        finally:
+            if stream is not None and stream is not f:
+                stream.close()
+            if f is not None:
+                f.close()
+        # Bookmarks aren't always in page order
+        entries.sort(key=lambda e: (e["start_page"], e["level"]))
+        attrs["entries"] = len(entries)
+        return {"page_count": page_count, "entries": _page_spans(entries, page_count)[:OUTLINE_MAX_ENTRIES]}
+
+
+# Cached per document content (an empty entry list is cached too, so outline-less PDFs are only opened once)
+def get_document_outline(pdf_path):
+    outline = get_outline(pdf_path)
+    if outline is None:
+        outline = read_outline(pdf_path)
+        store_outline(pdf_path, outline)
+    return outline
+
+
+# Compact chapter table for the prompt, or None if the PDF has no usable outline
+def format_chapter_table(pdf_path):
+    try:
+        outline = get_document_outline(pdf_path)
+    except OSError:
+        return None
+    entries = outline.get("entries", [])
+    if len(entries) < MIN_OUTLINE_ENTRIES:
+        return None
+
+    lines = [f"TABLE OF CONTENTS (from the PDF outline, {outline.get('page_count')} pages total):"]
+    for e in entries:
+        indent = "  " * e["level"]
+        lines.append(f"{indent}- {e['title']} (p. {e['start_page'] + 1}-{e['end_page'] + 1}, {e['pages']} pages)")
+    return "\n".join(lines)
@@ -0,0 +1,149 @@
+import os
+import mmap
+from pypdf import PdfReader
+
+from .pdf_cache import get_cached_text, store_text, get_page_count, store_page_count, get_features, store_features
+from .doc_features import DocumentFeatures, FEATURES_VERSION
+from .tracing import span, count
+
+# Lazy, page-by-page access to PDF text.
+# Pages are parsed only when a caller actually asks for them, each page is cached on its own,
+# and extraction stops as soon as the caller's character budget is met.
+
+HEADER_PAGES = 4
+
+
+def open_reader(pdf_path):
+    f = open(pdf_path, "rb")
+    try:
+        # Memory-map the file so a 100MB textbook isn't copied into RAM just to read a few pages
+        stream = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        stream = f  # Empty files and some special filesystems can't be mapped
+    return f, stream, PdfReader(stream)
+
+
+# Yields the text of each page in order, opening the PDF only if a page isn't cached yet
+def iter_page_text(pdf_path, max_pages=None):
+    f = stream = reader = None
+    page_count = get_page_count(pdf_path)
+    try:
+        page = 0
+        while max_pages is None or page < max_pages:
+            if page_count is not None and page >= page_count:
+                return
+
+            text = get_cached_text(pdf_path, page, page + 1)
+            count("pdf.page_cache_hit" if text is not None else "pdf.page_cache_miss")
+            if text is None:
+                if reader is None:
+                    f, stream, reader = open_reader(pdf_path)
+                    page_count = len(reader.pages)
+                    store_page_count(pdf_path, page_count)
+                    if page >= page_count:
+                        return
+                text = reader.pages[page].extract_text() or ""
+                store_text(pdf_path, page, page + 1, text)
+
+            yield text
+            page += 1
+    finally:
+        if stream is not None and stream is not f:
+            stream.close()
+        if f is not None:
+            f.close()
+
+
+# Reads pages until char_budget characters are collected (or max_pages run out). Raises on unreadable files.
+# Every page read is also scanned for document features (dates, course codes, type) in the same pass.
+def read_text(pdf_path, char_budget=None, max_pages=HEADER_PAGES):
+    parts = []
+    total = 0
+    features = DocumentFeatures(pdf_path)
+    with span("pdf.extract", "pdf", file=os.path.basename(pdf_path), budget=char_budget) as attrs:
+        for text in iter_page_text(pdf_path, max_pages):
+            parts.append(text)
+            features.add_page(text)
+            total += len(text)
+            if char_budget is not None and total >= char_budget:
+                break
+        attrs["pages"] = len(parts)
+        attrs["chars"] = total
+    _update_features(pdf_path, features)
+
+    text = "".join(parts)
+    return text[:char_budget] if char_budget is not None else text
+
+
+# Cached feature record, or None if there is none or it was scored by an older version of doc_features
+def _cached_features(pdf_path):
+    cached = get_features(pdf_path)
+    return cached if cached is not None and cached.get("version") == FEATURES_VERSION else None
+
+
+# Keeps the record from the deepest read of the document so far
+def _update_features(pdf_path, features):
+    cached = _cached_features(pdf_path)
+    if cached is None or features.pages > cached.get("pages_scanned", 0):
+        store_features(pdf_path, features.record())
+
+
+# Feature record of a document (see doc_features). Normally written as a side effect of reading the text;
+# otherwise the first max_pages pages are scanned now (served from the page cache when already extracted).
+def get_document_features(pdf_path, max_pages=HEADER_PAGES):
+    try:
+        cached = _cached_features(pdf_path)
+    except OSError:
+        cached = None
+    if cached is not None:
+        count("pdf.features_cache_hit")
+        return cached
+
+    features = DocumentFeatures(pdf_path)
+    try:
+        for text in iter_page_text(pdf_path, max_pages):
+            features.add_page(text)
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}")
+        count("pdf.errors")
+        return features.record()
+    record = features.record()
+    store_features(pdf_path, record)
+    return record
+
+
+# Each agent asks for its own budget: the sorter needs a couple thousand characters, the analyst far more.
+def extract_text(pdf_path, char_budget=None, max_pages=HEADER_PAGES):
+    try:
+        return read_text(pdf_path, char_budget, max_pages)
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}")
+        count("pdf.errors")
+        return ""
+
+
+# Same result as extract_text, but only from the page cache: None as soon as a needed page isn't cached.
+# Lets callers skip handing already-extracted files to a worker process.
+def extract_cached_text(pdf_path, char_budget=None, max_pages=HEADER_PAGES):
+    try:
+        page_count = get_page_count(pdf_path)
+    except OSError:
+        return None
+    if page_count is None:
+        return None
+
+    parts = []
+    total = 0
+    last_page = page_count if max_pages is None else min(page_count, max_pages)
+    for page in range(last_page):
+        text = get_cached_text(pdf_path, page, page + 1)
+        if text is None:
+            return None
+        parts.append(text)
+        total += len(text)
+        if char_budget is not None and total >= char_budget:
+            break
+    count("pdf.page_cache_hit", len(parts))
+
+    text = "".join(parts)
+    return text[:char_budget] if char_budget is not None else text
@@ -0,0 +1,240 @@
+import os
+import json
+import threading
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from .pdf_cache import CACHE_DIR, file_digest
+from .extract_pool import extract_many
+from .pdf_reader import HEADER_PAGES
+from .agent1_sorter import (
+    select_discovery_candidates, pack_discovery_shards, discover_shards, merge_course_maps, assign_files_batch,
+    DISCOVERY_CHAR_BUDGET, SORTER_DISCOVERY_TOKEN_BUDGET, SORTER_MAX_WORKERS
+)
+from .agent2_ranking import (
+    read_course_documents, course_context, request_analysis, fallback_analysis, analyze_course_with_store,
+    analysis_fingerprint, scale_relative_difficulty, ANALYST_MAX_WORKERS
+)
+from .course_store import COURSE_STORE_ENABLED
+from .tracing import span, count, propagate
+
+# Incremental planner for watch mode. The pipeline is a chain of memoised nodes:
+#   file -> extracted text -> course assignment -> course analysis -> schedule + audit -> render
+# Every node's output is stored under a hash of its inputs, so when one PDF is added, removed or edited only
+# that file is re-classified, only its course is re-analysed, and then the plan is rebuilt. Extracted text is
+# memoised by the PDF cache itself; the other nodes live in PIPELINE_STATE_PATH so they survive restarts.
+
+PIPELINE_STATE_PATH = os.path.join(CACHE_DIR, "pipeline_state.json")
+WATCH_POLL_SECONDS = float(os.getenv("PLANNER_WATCH_POLL_SECONDS", "2"))
+
+
+def _hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def list_pdfs(upload_dir):
+    return sorted(
+        os.path.join(upload_dir, f) for f in os.listdir(upload_dir) if f.lower().endswith(".pdf")
+    )
+
+
+class IncrementalPlanner:
+    """Runs the four agents over upload_dir, recomputing only the nodes whose inputs changed since last time.
+
+    schedule_fn(course_files, all_course_data) -> (schedule, audit_report) runs the Agent 3/4 loop and
+    render_fn(schedule, audit_report) writes the outputs; both come from the caller so watch mode reuses
+    the exact same loop and renderer as a normal run.
+    """
+
+    def __init__(self, upload_dir, schedule_fn, render_fn, user_hints=None, state_path=None):
+        self.upload_dir = upload_dir
+        self.schedule_fn = schedule_fn
+        self.render_fn = render_fn
+        self.user_hints = user_hints
+        self.state_path = state_path or PIPELINE_STATE_PATH
+        self.memo = self._load()
+        self.course_files = {}
+
+    def _load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+        for node in ("discovery", "assignments", "analyses", "schedule"):
+            memo.setdefault(node, {})
+        return memo
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.memo, f)
+        os.replace(tmp_path, self.state_path)
+
+    # Node: syllabus discovery, kept per shard of candidate files (syllabi, outlines, exam guides).
+    # A shard's course map is reused while all of its files are still candidates with the same content, so a
+    # new syllabus costs one request over the new candidates instead of a rediscovery of the whole folder.
+    def _discover(self, paths, digests):
+        hints_key = _hash(self.user_hints)
+        node = self.memo["discovery"]
+        shards = node.get("shards", []) if node.get("hints") == hints_key else []
+
+        # Reading the headers (page cache hits after the first pass) also writes the features candidates are picked by
+        headers = dict(zip(paths, extract_many([(p, DISCOVERY_CHAR_BUDGET, HEADER_PAGES) for p in paths])))
+        file_data = [{"path": p, "text": headers[p]} for p in paths if headers[p]]
+        candidates = select_discovery_candidates(file_data)
+        current = {digests[data["path"]] for data in candidates}
+        shards = [s for s in shards if set(s["files"]) <= current]
+        covered = {d for s in shards for d in s["files"]}
+        todo = [data for data in candidates if digests[data["path"]] not in covered]
+
+        if todo:
+            print(f"  -> Pipeline: scanning {len(todo)} new/changed syllabi/outline(s) for courses...")
+            with span("pipeline.discover", files=len(todo)):
+                new_shards = pack_discovery_shards(todo, SORTER_DISCOVERY_TOKEN_BUDGET)
+                course_maps = discover_shards(new_shards, self.user_hints)
+            for shard, course_map in zip(new_shards, course_maps):
+                shards.append({"files": [digests[data["path"]] for data in shard], "map": course_map})
+        else:
+            count("pipeline.discovery_reused")
+
+        self.memo["discovery"] = {"hints": hints_key, "shards": shards}
+        return merge_course_maps([s["map"] for s in shards])
+
+    # Node: file -> course, keyed by file content. A stored assignment is redone only when its course was dropped
+    # from the course map, or when it went to General_Items and courses have been added since.
+    def _assign(self, paths, digests, course_map):
+        assignments = self.memo["assignments"]
+        keys = {p: digests[p] for p in paths}
+
+        def stale(entry):
+            if not isinstance(entry, dict):
+                return True
+            course, known = entry["course"], set(entry["courses"])
+            if course in known and course not in course_map:
+                return True
+            return course == "General_Items" and bool(set(course_map) - known)
+
+        todo = [p for p in paths if stale(assignments.get(keys[p]))]
+
+        if todo:
+            print(f"  -> Pipeline: classifying {len(todo)} new/changed file(s)...")
+            with span("pipeline.assign", files=len(todo)):
+                texts = extract_many([(p, DISCOVERY_CHAR_BUDGET, HEADER_PAGES) for p in todo])
+                file_data = [
+                    {"path": p, "text": t, "complete": len(t) < DISCOVERY_CHAR_BUDGET} for p, t in zip(todo, texts) if t
+                ]
+                courses = assign_files_batch(file_data, course_map, max_workers=SORTER_MAX_WORKERS)
+            known = sorted(course_map)
+            for p in todo:
+                assignments[keys[p]] = {"course": None, "courses": known}  # unreadable files stay unassigned (same as sort_files)
+            for data, course in zip(file_data, courses):
+                assignments[keys[data["path"]]] = {"course": course, "courses": known}
+
+        # Forget files that are gone, so the memo doesn't grow forever
+        self.memo["assignments"] = {keys[p]: assignments[keys[p]] for p in paths}
+
+        course_files = {}
+        for p in paths:
+            course = assignments[keys[p]]["course"]
+            if course is not None:
+                course_files.setdefault(course, []).append(p)
+        return course_files
+
+    # Node: course documents -> base analysis, keyed by course + document fingerprint (+ the user's constraints)
+    def _analyze(self, course_files, user_constraints="None"):
+        analyses = self.memo["analyses"]
+        courses = [c for c in course_files if c != "General_Items"]
+        fingerprints = {c: analysis_fingerprint(course_files[c], user_constraints) for c in courses}
+        changed = [c for c in courses if analyses.get(c, {}).get("fingerprint") != fingerprints[c]]
+
+        if changed:
+            print(f"  -> Pipeline: analysing {len(changed)} changed course(s): {', '.join(changed)}")
+            with span("pipeline.analyze", courses=len(changed)):
+                texts = read_course_documents({c: course_files[c] for c in changed})
+
+                def analyze(course):
+                    context = course_context(course_files[course], texts)
+                    if COURSE_STORE_ENABLED:
+                        return analyze_course_with_store(course, context, course_files[course], user_constraints)
+                    return (
+                        request_analysis(course, context, user_constraints=user_constraints)
+                        or fallback_analysis(course)
+                    )
+
+                with ThreadPoolExecutor(max_workers=max(1, min(ANALYST_MAX_WORKERS, len(changed)))) as pool:
+                    results = list(pool.map(propagate(analyze), changed))
+            for course, analysis in zip(changed, results):
+                analyses[course] = {"fingerprint": fingerprints[course], "analysis": analysis}
+        else:
+            count("pipeline.analysis_reused")
+
+        self.memo["analyses"] = {c: analyses[c] for c in courses}
+        scaled = scale_relative_difficulty([analyses[c]["analysis"] for c in courses])
+        return [{"course": c, "analysis": a} for c, a in zip(courses, scaled)]
+
+    # One pass over the DAG. Returns True if a new plan was rendered.
+    def run(self, user_constraints, start_date, end_date):
+        paths = list_pdfs(self.upload_dir)
+        if not paths:
+            print(f"⚠️  No PDFs found in '{self.upload_dir}'.")
+            return False
+        digests = {p: file_digest(p) for p in paths}
+
+        course_map = self._discover(paths, digests)
+        self.course_files = self._assign(paths, digests, course_map)
+        all_course_data = self._analyze(self.course_files, user_constraints)
+        self._save()
+
+        # Node: schedule + audit, keyed by everything Agents 3 and 4 look at
+        key = _hash([all_course_data, start_date, end_date, user_constraints])
+        node = self.memo["schedule"]
+        if node.get("key") == key:
+            count("pipeline.schedule_reused")
+            print("  -> Pipeline: nothing that affects the plan changed.")
+            return False
+
+        schedule, report = self.schedule_fn(self.course_files, all_course_data)
+        self.memo["schedule"] = {"key": key, "schedule": schedule, "report": str(report)}
+        self._save()
+
+        # Node: render
+        self.render_fn(schedule, report)
+        return True
+
+
+def _directory_signature(upload_dir):
+    try:
+        return sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(upload_dir) if entry.name.lower().endswith(".pdf")
+        )
+    except OSError:
+        return None
+
+
+# Polls upload_dir and calls on_change() once at start and again whenever a PDF is added, removed or edited.
+# A change is only acted on once the folder has been stable for one poll (so half-copied files are skipped).
+def watch_directory(upload_dir, on_change, poll_seconds=None):
+    poll_seconds = WATCH_POLL_SECONDS if poll_seconds is None else poll_seconds
+    last = _directory_signature(upload_dir)
+    on_change()
+    print(f"\n👀 Watching '{upload_dir}' for changes (Ctrl+C to stop)...")
+
+    try:
+        while True:
+            time.sleep(poll_seconds)
+            current = _directory_signature(upload_dir)
+            if current == last:
+                continue
+            time.sleep(poll_seconds)
+            if _directory_signature(upload_dir) != current:
+                continue  # Still being written; look again next poll
+            last = current
+            print(f"\n🔄 Change detected in '{upload_dir}'. Re-planning...")
+            on_change()
+            print(f"\n👀 Watching '{upload_dir}' for changes (Ctrl+C to stop)...")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching.")
@@ -0,0 +1,57 @@
+import time
+import threading
+
+# Structured progress + cooperative cancellation for a planner run.
+# The pipeline (in a worker thread) reports events such as {"event": "course_analyzed", "course": "PHYS 234",
+# "done": 2, "total": 4} (or each Agent 3 draft day as it is finished) through emit(), and calls check() at its safe points (between stages, before each
+# course analysis, between Agent 3/4 attempts, during 429 cool-downs). cancel() makes the next check() raise
+# PlannerCancelled; the last checkpoint stays on disk, so the run can be resumed later.
+
+EVENT_STARTED = "started"
+EVENT_STAGE = "stage_started"
+EVENT_FILES_SORTED = "files_sorted"
+EVENT_FILES_READ = "files_read"
+EVENT_COURSE_ANALYZED = "course_analyzed"
+EVENT_DAY_DRAFTED = "day_drafted"
+EVENT_ATTEMPT_AUDITED = "attempt_audited"
+EVENT_PLAN_SAVED = "plan_saved"
+EVENT_DONE = "done"
+EVENT_CANCELLED = "cancelled"
+EVENT_ERROR = "error"
+
+
+class PlannerCancelled(Exception):
+    pass
+
+
+class ProgressReporter:
+    """Passes progress events to emit (any callable taking one dict) and carries the run's cancel flag."""
+
+    def __init__(self, emit=None):
+        self._emit = emit
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def event(self, kind, **data):
+        event = {"event": kind, "time": time.time(), **data}
+        if self._emit is not None:
+            # Course analyses finish on several threads at once
+            with self._lock:
+                self._emit(event)
+        return event
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise PlannerCancelled("Planner run cancelled.")
+
+    # time.sleep that wakes up (and raises) as soon as the run is cancelled
+    def sleep(self, seconds):
+        if self._cancel.wait(seconds):
+            raise PlannerCancelled("Planner run cancelled.")
@@ -0,0 +1,70 @@
+import os
+import re
+import time
+import random
+import threading
+
+# Requests/second we allow ourselves against the Gemini API, plus how many can burst at once.
+# Every concurrent agent call goes through the same bucket so parallelism doesn't turn into 429s.
+GEMINI_REQUESTS_PER_SECOND = float(os.getenv("GEMINI_REQUESTS_PER_SECOND", "2"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "4"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket. acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+gemini_limiter = TokenBucket(GEMINI_REQUESTS_PER_SECOND, GEMINI_BURST)
+
+
+# Pulls the server's "retry after" hint out of a 429 error, if it sent one.
+# Gemini reports it either as "retry_delay { seconds: 23 }" or as "Please retry in 23.5s".
+RETRY_HINT_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)"),
+    re.compile(r"retry in\s*(\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+    re.compile(r"retry[- ]after:?\s*(\d+(?:\.\d+)?)", re.IGNORECASE),
+]
+
+
+def retry_after_seconds(error):
+    message = str(error)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_rate_limit_error(error):
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message.upper()
+
+
+# Exponential backoff with full jitter, unless the server told us exactly how long to wait
+def backoff_delay(error, attempt, base_delay=2.0, max_delay=60.0):
+    hint = retry_after_seconds(error)
+    if hint is not None:
+        return hint + random.uniform(0, 1)
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
@@ -0,0 +1,197 @@
+import os
+import csv
+import json
+import datetime
+import contextlib
+
+from .schedule_model import ScheduleModel, format_minutes
+from .tracing import span
+
+# One rendering pipeline for both entry points. Schedule days are consumed as a stream and every output
+# format is written in the same pass through buffered files, so a long plan renders in constant memory
+# (one day at a time) and the calendar export comes straight from the parsed events, not from the JSON file.
+
+OUTPUT_FORMATS = [f.strip() for f in os.getenv("PLANNER_OUTPUT_FORMATS", "md,json,ics,csv").split(",") if f.strip()]
+WRITE_BUFFER_BYTES = 64 * 1024
+
+ICS_LINE_LIMIT = 75             # RFC 5545: lines longer than 75 octets are folded
+
+
+def _status_icon(audit_report):
+    return "✅" if "approved" in str(audit_report).lower() else "⚠️"
+
+
+def _event_icon(kind):
+    if "BREAK" in kind: return "☕"
+    if "MEAL" in kind: return "🍽️"
+    if "PERSONAL" in kind or "WAKE" in kind: return "🛌"
+    if "REVIEW" in kind: return "🧠"
+    return "📚"
+
+
+class MarkdownWriter:
+    extension = "md"
+
+    def __init__(self, f):
+        self.f = f
+        self.days = 0
+
+    def begin(self, audit_report):
+        self.f.write("# 📅 Final Exam Study Plan\n\n")
+        # Auditor Status Header
+        self.f.write("### 🛡️ Auditor Report (Agent 4)\n")
+        self.f.write(f"> {_status_icon(audit_report)} **STATUS:** {audit_report}\n\n---\n")
+
+    def day(self, day_data, model, day):
+        self.days += 1
+        self.f.write(f"## {model.day_names[day]}, {model.dates[day] or 'Unknown'}\n")
+        self.f.write("| Time | Type | Task |\n| :--- | :--- | :--- |\n")
+        for row in model.rows(day):
+            kind = model.kind_of(row).upper()
+            self.f.write(f"| **{model.time_str(row)}** | {_event_icon(kind)} {kind} | {model.task[row]} |\n")
+        self.f.write("\n---\n\n")
+
+    def end(self, meta):
+        if not self.days:
+            self.f.write("No schedule generated.")
+
+
+# Same document json.dump(schedule_data, indent=2) would give (days are written as they came), one day at a time
+class JsonWriter:
+    extension = "json"
+
+    def __init__(self, f):
+        self.f = f
+        self.days = 0
+
+    def begin(self, audit_report):
+        self.f.write('{\n  "schedule": [')
+
+    def day(self, day_data, model, day):
+        text = json.dumps(day_data, indent=2).replace("\n", "\n    ")
+        self.f.write(f"{',' if self.days else ''}\n    {text}")
+        self.days += 1
+
+    def end(self, meta):
+        self.f.write("\n  ]" if self.days else "]")
+        for key, value in meta.items():
+            self.f.write(f",\n  {json.dumps(key)}: {json.dumps(value, indent=2).replace(chr(10), chr(10) + '  ')}")
+        self.f.write("\n}")
+
+
+def _ics_escape(text):
+    return str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_fold(line):
+    # Fold on character boundaries, keeping every physical line within the octet limit
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > ICS_LINE_LIMIT:
+            parts.append(current)
+            current, size = " ", 1
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts) + "\r\n"
+
+
+# iCalendar export: one VEVENT per timed event (point-in-time markers like SLEEP are skipped), floating local time
+class IcsWriter:
+    extension = "ics"
+
+    def __init__(self, f):
+        self.f = f
+        self.stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def _line(self, line):
+        self.f.write(_ics_fold(line))
+
+    def begin(self, audit_report):
+        for line in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Final.AI//Study Planner//EN", "CALSCALE:GREGORIAN"):
+            self._line(line)
+
+    def day(self, day_data, model, day):
+        try:
+            midnight = datetime.datetime.strptime(str(model.dates[day]), "%Y-%m-%d")
+        except ValueError:
+            return
+        for index, row in enumerate(model.rows(day)):
+            if not model.is_timed(row):
+                continue
+            start = midnight + datetime.timedelta(minutes=model.start[row])
+            end = midnight + datetime.timedelta(minutes=model.end[row])
+            self._line("BEGIN:VEVENT")
+            self._line(f"UID:{model.dates[day]}-{index}@final-ai")
+            self._line(f"DTSTAMP:{self.stamp}")
+            self._line(f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}")
+            self._line(f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}")
+            self._line(f"SUMMARY:{_ics_escape(model.task[row])}")
+            if model.kind_of(row):
+                self._line(f"CATEGORIES:{_ics_escape(model.kind_of(row).upper())}")
+            self._line("END:VEVENT")
+
+    def end(self, meta):
+        self._line("END:VCALENDAR")
+
+
+class CsvWriter:
+    extension = "csv"
+
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+
+    def begin(self, audit_report):
+        self.writer.writerow(["date", "day_name", "time", "start", "end", "type", "task"])
+
+    def day(self, day_data, model, day):
+        for row in model.rows(day):
+            timed = model.is_timed(row)
+            self.writer.writerow([
+                model.dates[day], model.day_names[day], model.time_str(row),
+                format_minutes(model.start[row]) if timed else "",
+                format_minutes(model.end[row]) if timed else "",
+                model.kind_of(row), model.task[row],
+            ])
+
+    def end(self, meta):
+        pass
+
+
+WRITERS = {w.extension: w for w in (MarkdownWriter, JsonWriter, IcsWriter, CsvWriter)}
+
+
+# Writes every format for a stream of schedule days (JSON-shaped day dicts) in one pass.
+# output_base is the path without extension ("final_study_plan" -> final_study_plan.md, .json, ...).
+# meta holds the plan's other top-level keys (e.g. unscheduled_hours). Returns {format: path}.
+def render_days(days, audit_report, output_base, formats=None, meta=None):
+    formats = [f for f in (formats or OUTPUT_FORMATS) if f in WRITERS]
+    paths = {fmt: f"{output_base}.{fmt}" for fmt in formats}
+
+    with span("render.write", formats=",".join(formats)) as attrs, contextlib.ExitStack() as stack:
+        writers = []
+        for fmt in formats:
+            # The ics and csv writers emit their own line endings
+            newline = "" if fmt in ("ics", "csv") else None
+            f = stack.enter_context(open(paths[fmt], "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES, newline=newline))
+            writers.append(WRITERS[fmt](f))
+
+        for writer in writers:
+            writer.begin(audit_report)
+        count = 0
+        for day in days:
+            model = ScheduleModel.from_json({"schedule": [day]})
+            for writer in writers:
+                writer.day(day, model, 0)
+            count += 1
+        for writer in writers:
+            writer.end(meta or {})
+        attrs["days"] = count
+    return paths
+
+
+def render_plan(schedule_data, audit_report, output_base, formats=None):
+    schedule_data = schedule_data if isinstance(schedule_data, dict) else {}
+    meta = {k: v for k, v in schedule_data.items() if k != "schedule"}
+    return render_days(schedule_data.get("schedule") or [], audit_report, output_base, formats, meta)
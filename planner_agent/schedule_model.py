@@ -0,0 +1,276 @@
+import re
+from array import array
+
+import numpy as np
+
+# Compact schedule representation shared by the local scheduler, the auditor and the renderers.
+# The JSON plan ({"schedule": [{"date", "day_name", "events": [{"time", "task", "type"}]}]}) is parsed once
+# into flat columns, one row per event: start/end in minutes since the day's midnight (ends past 1440 cross
+# midnight), an interned type id and course id, and the task text. Days are slices of the rows (offsets).
+# Per-day aggregates (work minutes, overlaps, night-time work) are computed from the columns as NumPy array
+# operations instead of every consumer re-parsing "07:00 - 08:00" strings out of thousands of small dicts.
+
+NON_WORK_TYPES = {"personal", "meal", "break", "sleep", "wake"}
+NON_WORK_TASKS = {"SLEEP", "LUNCH", "DINNER", "BREAKFAST", "MORNING ROUTINE"}
+
+NIGHT_START = 0                 # 00:00
+NIGHT_END = 6 * 60              # 06:00
+
+NO_TIME = -1                    # start/end of an event whose "time" isn't a clock time (kept verbatim)
+NO_COURSE = -1
+
+TIME_RANGE_PATTERN = re.compile(
+    r"(\d{1,2}):(\d{2})\s*(am|pm)?\s*[-–]\s*(\d{1,2}):(\d{2})\s*(am|pm)?", re.IGNORECASE
+)
+TIME_POINT_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*(am|pm)?\s*$", re.IGNORECASE)
+
+
+def _clock(hour, minute, meridiem):
+    hour = int(hour) % 24
+    if meridiem:
+        meridiem = meridiem.lower()
+        if meridiem == "pm" and hour < 12:
+            hour += 12
+        elif meridiem == "am" and hour == 12:
+            hour = 0
+    return hour * 60 + int(minute)
+
+
+# "07:00 - 08:30" -> (420, 510). Ranges that cross midnight end past 1440. Returns None for "01:00" style times.
+def parse_time_range(time_str):
+    match = TIME_RANGE_PATTERN.search(time_str or "")
+    if not match:
+        return None
+    start = _clock(*match.group(1, 2, 3))
+    end = _clock(*match.group(4, 5, 6))
+    if end <= start:
+        end += 24 * 60
+    return start, end
+
+
+def format_minutes(minutes):
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def normalize_name(text):
+    return re.sub(r"\s+", "", str(text)).upper()
+
+
+class ScheduleModel:
+    """A study plan as flat event columns. Build it with from_json() or add_day()/add_event(), emit it with to_json()."""
+
+    __slots__ = (
+        "dates", "day_names", "day_extras", "offsets", "start", "end", "kind", "course", "task",
+        "raw_time", "kinds", "_kind_ids", "courses", "_course_keys", "meta",
+    )
+
+    def __init__(self, courses=()):
+        self.dates = []
+        self.day_names = []
+        self.day_extras = []            # Any other keys of a day dict, passed through untouched
+        self.offsets = array("i", [0])  # Rows of day d are offsets[d]:offsets[d + 1]
+        self.start = array("i")
+        self.end = array("i")
+        self.kind = array("h")
+        self.course = array("h")
+        self.task = []
+        self.raw_time = {}              # row -> "time" text that isn't a clock time
+        self.kinds = []
+        self._kind_ids = {}
+        self.courses = list(courses)
+        self._course_keys = [normalize_name(c) for c in self.courses]
+        self.meta = {}                  # Top-level keys other than "schedule" (e.g. unscheduled_hours)
+
+    @classmethod
+    def from_json(cls, schedule_data, courses=()):
+        model = cls(courses)
+        days = schedule_data.get("schedule") if isinstance(schedule_data, dict) else None
+        if isinstance(schedule_data, dict):
+            model.meta = {k: v for k, v in schedule_data.items() if k != "schedule"}
+        for day in days or []:
+            extra = {k: v for k, v in day.items() if k not in ("date", "day_name", "events")}
+            model.add_day(day.get("date"), day.get("day_name", ""), extra)
+            for event in day.get("events", []):
+                time_str = str(event.get("time", "") or "")
+                span = parse_time_range(time_str)
+                if span is None:
+                    point = TIME_POINT_PATTERN.match(time_str)
+                    span = (_clock(*point.groups()),) * 2 if point else None
+                if span is None:
+                    model.add_event(NO_TIME, NO_TIME, event.get("task", ""), event.get("type", ""), raw_time=time_str)
+                else:
+                    model.add_event(span[0], span[1], event.get("task", ""), event.get("type", ""))
+        return model
+
+    def add_day(self, date, day_name, extra=None):
+        self.dates.append(date)
+        self.day_names.append(day_name)
+        self.day_extras.append(extra or {})
+        self.offsets.append(self.offsets[-1])
+
+    # start == end is a point in time (e.g. SLEEP at 01:00). course=None looks the course up from the task text.
+    def add_event(self, start, end, task, kind, course=None, raw_time=None):
+        row = len(self.task)
+        self.start.append(start)
+        self.end.append(end)
+        self.kind.append(self._kind_id(kind))
+        self.course.append(self.course_id(task) if course is None else course)
+        self.task.append(str(task))
+        if raw_time is not None:
+            self.raw_time[row] = raw_time
+        self.offsets[-1] += 1
+
+    def _kind_id(self, kind):
+        kind = str(kind or "")
+        kind_id = self._kind_ids.get(kind)
+        if kind_id is None:
+            kind_id = self._kind_ids[kind] = len(self.kinds)
+            self.kinds.append(kind)
+        return kind_id
+
+    # First known course whose code appears in the task text (spaces and case ignored)
+    def course_id(self, task):
+        key = normalize_name(task)
+        for index, course_key in enumerate(self._course_keys):
+            if course_key in key:
+                return index
+        return NO_COURSE
+
+    def __len__(self):
+        return len(self.task)
+
+    @property
+    def n_days(self):
+        return len(self.dates)
+
+    def rows(self, day):
+        return range(self.offsets[day], self.offsets[day + 1])
+
+    def kind_of(self, row):
+        return self.kinds[self.kind[row]]
+
+    def is_timed(self, row):
+        return self.end[row] > self.start[row]
+
+    def time_str(self, row):
+        if row in self.raw_time:
+            return self.raw_time[row]
+        if self.start[row] == self.end[row]:
+            return format_minutes(self.start[row])
+        return f"{format_minutes(self.start[row])} - {format_minutes(self.end[row])}"
+
+    # 1 for rows that count as work (not sleep, meals, breaks or the morning routine)
+    def work_mask(self):
+        non_work_kinds = {i for i, k in enumerate(self.kinds) if k.lower() in NON_WORK_TYPES}
+        return array("b", (
+            0 if k in non_work_kinds or t.strip().upper() in NON_WORK_TASKS else 1
+            for k, t in zip(self.kind, self.task)
+        ))
+
+    # Day index of every row
+    def row_days(self):
+        return np.repeat(np.arange(self.n_days), np.diff(np.asarray(self.offsets, dtype=np.int64)))
+
+    # Per-day arrays, all computed as array operations over the columns:
+    #   course_minutes: (days x courses + 1) work minutes; rows without a known course (NO_COURSE = -1) land in the last column
+    #   work_minutes: per-day totals; overlaps: work blocks that start before an earlier one of the day ends
+    #   night: per-row flag for work between 00:00 and 06:00 (either night the block touches); night_rows: per day
+    def day_metrics(self, night_owl=False):
+        start = np.asarray(self.start, dtype=np.int64)
+        end = np.asarray(self.end, dtype=np.int64)
+        course = np.asarray(self.course, dtype=np.int64)
+        days = self.row_days()
+        work = np.asarray(self.work_mask(), dtype=bool) & (end > start)
+
+        course_minutes = np.zeros((self.n_days, len(self.courses) + 1), dtype=np.int64)
+        np.add.at(course_minutes, (days[work], course[work]), (end - start)[work])
+        work_minutes = course_minutes.sum(axis=1)
+
+        night = np.zeros(len(self), dtype=bool)
+        if not night_owl:
+            night = work & (
+                ((start < NIGHT_END) & (end > NIGHT_START))
+                | ((start < NIGHT_END + 24 * 60) & (end > NIGHT_START + 24 * 60))
+            )
+        night_rows = np.bincount(days[night], minlength=self.n_days)
+
+        # Sort work blocks by (day, start) and shift every day onto its own stretch of the number line, so a single
+        # running maximum of end times never carries from one day into the next
+        rows = np.flatnonzero(work)
+        rows = rows[np.lexsort((start[rows], days[rows]))]
+        stride = 4 * 24 * 60
+        shifted_start = start[rows] + days[rows] * stride
+        latest_end = np.maximum.accumulate(end[rows] + days[rows] * stride)
+        overlapping = shifted_start[1:] < latest_end[:-1]
+        overlaps = np.bincount(days[rows][1:][overlapping], minlength=self.n_days)
+
+        return {
+            "course_minutes": course_minutes, "work_minutes": work_minutes, "overlaps": overlaps,
+            "night": night, "night_rows": night_rows,
+        }
+
+    # Minutes per course id, over timed rows of the given type
+    def course_minutes(self, kind="study"):
+        minutes = [0] * len(self.courses)
+        kind_ids = {i for i, k in enumerate(self.kinds) if k.lower() == kind}
+        for row in range(len(self)):
+            if self.kind[row] in kind_ids and self.course[row] != NO_COURSE and self.is_timed(row):
+                minutes[self.course[row]] += self.end[row] - self.start[row]
+        return minutes
+
+    # Copy with only the rows keep(row) accepts, plus extra_events[day] = [(start, end, task, kind), ...].
+    # Days that get new events have their timed rows re-sorted by start; point-in-time ones (SLEEP) stay last.
+    def rebuild(self, keep=None, extra_events=None):
+        extra_events = extra_events or {}
+        model = ScheduleModel(self.courses)
+        model.meta = dict(self.meta)
+        for day in range(self.n_days):
+            model.add_day(self.dates[day], self.day_names[day], self.day_extras[day])
+            rows = [r for r in self.rows(day) if keep is None or keep(r)]
+            extra = extra_events.get(day)
+            if not extra:
+                for row in rows:
+                    model._copy_row(self, row)
+                continue
+
+            timed = [(self.start[r], 0, r) for r in rows if self.is_timed(r)]
+            timed += [(event[0], 1, event) for event in extra]
+            timed.sort(key=lambda item: (item[0], item[1]))
+            for _, is_new, item in timed:
+                if is_new:
+                    start, end, task, kind = item
+                    model.add_event(start, end, task, kind)
+                else:
+                    model._copy_row(self, item)
+            for row in rows:
+                if not self.is_timed(row):
+                    model._copy_row(self, row)
+        return model
+
+    def _copy_row(self, other, row):
+        self.add_event(
+            other.start[row], other.end[row], other.task[row], other.kind_of(row),
+            course=other.course[row], raw_time=other.raw_time.get(row)
+        )
+
+    def event_json(self, row):
+        return {"time": self.time_str(row), "task": self.task[row], "type": self.kind_of(row)}
+
+    def day_json(self, day):
+        return {
+            "date": self.dates[day],
+            "day_name": self.day_names[day],
+            **self.day_extras[day],
+            "events": [self.event_json(r) for r in self.rows(day)],
+        }
+
+    def to_json(self):
+        return {"schedule": [self.day_json(d) for d in range(self.n_days)], **self.meta}
+
+    # One line per event ("07:00 - 08:00 - Task"), the shape Agent 4's prompt uses
+    def minified(self):
+        return [
+            {"date": self.dates[d], "events": [f"{self.time_str(r)} - {self.task[r]}" for r in self.rows(d)]}
+            for d in range(self.n_days)
+        ]
@@ -0,0 +1,131 @@
+import re
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .schedule_model import ScheduleModel, normalize_name
+
+# Local fast-path auditor. Everything in Agent 4's checklist that is pure arithmetic
+# (missing courses, burnout, night-time work, total hours) is checked here in one pass over the events,
+# so the LLM only has to judge the fuzzy user constraints.
+
+BURNOUT_LIMIT_HOURS = 10
+MIN_COVERAGE_RATIO = 0.8        # Plan must schedule at least 80% of Agent 2's estimate (when it physically can)
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DAY_OFF_PATTERN = re.compile(r"no\s+(" + "|".join(WEEKDAYS) + r")s?\b", re.IGNORECASE)
+
+
+@dataclass
+class Violation:
+    """One broken rule. 'date' and 'course' are set when the problem is local to a day or course."""
+    code: str
+    message: str
+    date: Optional[str] = None
+    course: Optional[str] = None
+
+
+class AuditFeedback(str):
+    """The auditor's feedback text, which also carries the structured violations behind it."""
+
+    def __new__(cls, text, violations=None):
+        feedback = super().__new__(cls, text)
+        feedback.violations = list(violations or [])
+        return feedback
+
+
+# "No Fridays" -> {"friday"}
+def parse_days_off(user_constraints):
+    return {m.lower() for m in DAY_OFF_PATTERN.findall(str(user_constraints or ""))}
+
+
+def required_courses_and_hours(all_course_data):
+    required_courses = []
+    total_hours_needed = 0
+    for c in all_course_data:
+        required_courses.append(c['course'])
+        analysis = c['analysis']
+        if isinstance(analysis, list): analysis = analysis[0]
+        for t in analysis.get('topics', []):
+            total_hours_needed += t.get('est_hours', 0)
+    return required_courses, total_hours_needed
+
+
+def find_violations(schedule_data, all_course_data, user_constraints="None") -> List[Violation]:
+    days = schedule_data.get("schedule") if isinstance(schedule_data, dict) else None
+    if not days:
+        return [Violation("empty_schedule", "CRITICAL: The schedule was empty.")]
+
+    required_courses, total_hours_needed = required_courses_and_hours(all_course_data)
+    night_owl = "night owl" in str(user_constraints).lower()
+    model = ScheduleModel.from_json(schedule_data, required_courses)
+    metrics = model.day_metrics(night_owl)
+
+    # The limit checks run over whole arrays; only the flagged days are looked at one by one
+    over_limit = metrics["work_minutes"] > BURNOUT_LIMIT_HOURS * 60
+    flagged = np.flatnonzero(over_limit | (metrics["overlaps"] > 0) | (metrics["night_rows"] > 0))
+
+    violations = []
+    for day in flagged:
+        date = model.dates[day]
+        for row in model.rows(day):
+            if metrics["night"][row]:
+                violations.append(Violation(
+                    "night_work",
+                    f"'{model.task[row]}' at {model.time_str(row)} on {date} falls between 00:00 and 06:00.",
+                    date=date
+                ))
+
+        day_minutes = metrics["work_minutes"][day]
+        if over_limit[day]:
+            violations.append(Violation(
+                "burnout",
+                f"{date} has {day_minutes / 60:.1f} hours of work. The limit is {BURNOUT_LIMIT_HOURS} hours.",
+                date=date
+            ))
+        if metrics["overlaps"][day]:
+            violations.append(Violation(
+                "overlap",
+                f"{date} has {metrics['overlaps'][day]} work block(s) that overlap another one.",
+                date=date
+            ))
+
+    # Rows were matched to the first course in their task; a task naming two courses counts for both
+    present = set(model.course)
+    all_tasks = None
+    for index, course in enumerate(required_courses):
+        if index in present:
+            continue
+        if all_tasks is None:
+            all_tasks = "|".join(normalize_name(t) for t in model.task)
+        if normalize_name(course) not in all_tasks:
+            violations.append(Violation(
+                "missing_course",
+                f"You completely forgot to schedule '{course}'. Please add it.",
+                course=course
+            ))
+
+    # Only complain about missing hours if the horizon could actually hold them under the burnout cap
+    days_off = parse_days_off(user_constraints)
+    work_days = sum(1 for name in model.day_names if str(name).lower() not in days_off)
+    capacity_hours = work_days * BURNOUT_LIMIT_HOURS
+    scheduled_hours = int(metrics["work_minutes"].sum()) / 60
+    if scheduled_hours < MIN_COVERAGE_RATIO * min(total_hours_needed, capacity_hours):
+        violations.append(Violation(
+            "total_hours",
+            f"Only {scheduled_hours:.1f} of the {total_hours_needed:.1f} estimated hours are scheduled."
+        ))
+
+    return violations
+
+
+def format_feedback(violations):
+    return "REJECTED: " + " ".join(v.message for v in violations)
+
+
+# Same contract as audit_schedule: (is_valid, feedback), where feedback also exposes .violations
+def validate_schedule(schedule_data, all_course_data, user_constraints="None"):
+    violations = find_violations(schedule_data, all_course_data, user_constraints)
+    if violations:
+        return False, AuditFeedback(format_feedback(violations), violations)
+    return True, AuditFeedback("Approved. The plan covers all courses and passes the burnout, sleep and workload checks.")
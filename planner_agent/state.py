@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional
+
+from .schedule_validator import AuditFeedback, Violation
+from .pdf_cache import file_digest
+
+# Shared state of the agent team, used by both entry points (main.py and the ADK tool).
+# It is checkpointed atomically after every stage and every Agent 3/4 iteration, so a run that dies
+# (e.g. in a 429 storm) can be resumed without paying for Agent 1 and Agent 2 again.
+# A checkpoint is only resumed for the exact same uploads: same paths and same content digests.
+
+CHECKPOINT_FILE = os.getenv("PLANNER_CHECKPOINT_FILE", "planner_checkpoint.json")
+CHECKPOINT_VERSION = 2
+
+# Stage names, in pipeline order
+STAGE_SORT = "agent1.sort"
+STAGE_ANALYZE = "agent2.analyze"
+STAGE_SCHEDULE = "agent3_4.loop"
+STAGE_RENDER = "render"
+
+
+@dataclass
+class PlannerState:
+    """Represents the shared memory/state of the Agent Team."""
+    user_hints: str = None
+    user_constraints: str = "None"
+    start_date: str = None
+    end_date: str = None
+    pdf_files: List[str] = field(default_factory=list)
+    pdf_digests: Dict[str, str] = field(default_factory=dict)   # path -> content digest, checked on resume
+    course_files: Dict = field(default_factory=dict)
+    course_analysis: List[Dict] = field(default_factory=list)
+    draft_schedule: Dict = field(default_factory=dict)
+    feedback_history: List[str] = field(default_factory=list)
+    completed_stages: List[str] = field(default_factory=list)
+    attempt: int = 0                      # Last finished Agent 3/4 iteration
+    is_valid: bool = False
+    last_feedback: str = ""
+    last_violations: List[Dict] = field(default_factory=list)
+
+    def is_done(self, stage):
+        return stage in self.completed_stages
+
+    def mark_done(self, stage):
+        if stage not in self.completed_stages:
+            self.completed_stages.append(stage)
+
+    # Keeps the structured violations next to the text, so a resumed run can still repair locally
+    def record_feedback(self, feedback):
+        self.last_feedback = str(feedback)
+        self.last_violations = [asdict(v) for v in getattr(feedback, "violations", [])]
+
+    def feedback(self):
+        return AuditFeedback(self.last_feedback, [Violation(**v) for v in self.last_violations])
+
+
+# {path: content digest} of the uploads, so a PDF edited in place doesn't resume stale analyses
+def upload_digests(pdf_files):
+    return {p: file_digest(p) for p in pdf_files}
+
+
+def save_checkpoint(state, path=None):
+    path = path or CHECKPOINT_FILE
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    # Write + fsync a temp file, then atomically swap it in: a crash leaves either the old or the new checkpoint
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CHECKPOINT_VERSION, "state": asdict(state)}, f, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path=None) -> Optional[PlannerState]:
+    path = path or CHECKPOINT_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != CHECKPOINT_VERSION:
+        return None
+
+    known = PlannerState.__dataclass_fields__
+    return PlannerState(**{k: v for k, v in data.get("state", {}).items() if k in known})
+
+
+def clear_checkpoint(path=None):
+    try:
+        os.remove(path or CHECKPOINT_FILE)
+    except OSError:
+        pass
@@ -0,0 +1,185 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+import contextvars
+from collections import defaultdict
+
+# Lightweight in-process tracing for the planner pipeline.
+# Stages, PDF reads, LLM calls, JSON parsing and Agent 3/4 iterations are recorded as spans; retries,
+# 429s and cache hits/misses as counters. At the end of a run the spans are written as a Chrome/Perfetto
+# compatible JSON trace and summarised as a table.
+# Each run records into the current Trace (a context variable), so concurrent planner sessions in one server
+# keep separate traces: trace_context() starts a fresh one, and propagate() carries it into pool threads.
+
+TRACE_FILE = os.getenv("PLANNER_TRACE_FILE", "planner_trace.json")
+
+_profile_stages = set()
+
+
+class Trace:
+    def __init__(self):
+        self.spans = []
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+        self.epoch = time.perf_counter()
+
+
+_current = contextvars.ContextVar("planner_trace", default=Trace())
+
+
+def current():
+    return _current.get()
+
+
+def reset():
+    trace = current()
+    with trace.lock:
+        trace.spans.clear()
+        trace.counters.clear()
+        trace.epoch = time.perf_counter()
+
+
+# Usage: with trace_context(): ... everything recorded in this block (and propagated threads) goes to a new Trace
+# (or to the given one, so a caller can read the run's trace afterwards)
+@contextlib.contextmanager
+def trace_context(trace=None):
+    trace = trace or Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+# Wraps fn for a thread pool so it records into the caller's trace (threads don't inherit context variables)
+def propagate(fn):
+    trace = current()
+
+    def run(*args, **kwargs):
+        token = _current.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+# Span names listed here are wrapped in cProfile (e.g. --profile agent2.analyze)
+def enable_profiling(stage_names):
+    _profile_stages.update(stage_names)
+
+
+def count(name, n=1):
+    trace = current()
+    with trace.lock:
+        trace.counters[name] += n
+
+
+# Usage: with span("agent2.analyze", course=name) as attrs: ... attrs["tokens"] = 123
+@contextlib.contextmanager
+def span(name, category="stage", **attrs):
+    profiler = None
+    if name in _profile_stages:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    trace = current()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _report_profile(name, profiler)
+        with trace.lock:
+            trace.spans.append({
+                "name": name,
+                "cat": category,
+                "start": start - trace.epoch,
+                "duration": duration,
+                "tid": threading.get_ident(),
+                "args": attrs,
+            })
+
+
+def _report_profile(name, profiler):
+    out_path = f"profile_{name.replace('/', '_')}.prof"
+    profiler.dump_stats(out_path)
+    buffer = io.StringIO()
+    pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(15)
+    print(f"\n🔬 cProfile for '{name}' (full stats in {out_path}):")
+    print(buffer.getvalue())
+
+
+def snapshot():
+    trace = current()
+    with trace.lock:
+        return list(trace.spans), dict(trace.counters)
+
+
+def summary_table():
+    spans, counters = snapshot()
+
+    by_name = {}
+    for s in spans:
+        stats = by_name.setdefault(s["name"], {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += s["duration"]
+        stats["max"] = max(stats["max"], s["duration"])
+
+    lines = [f"{'SPAN':<28} {'COUNT':>6} {'TOTAL s':>9} {'MEAN s':>8} {'MAX s':>8}"]
+    for name, stats in sorted(by_name.items(), key=lambda kv: -kv[1]["total"]):
+        lines.append(
+            f"{name:<28} {stats['count']:>6} {stats['total']:>9.3f} "
+            f"{stats['total'] / stats['count']:>8.3f} {stats['max']:>8.3f}"
+        )
+
+    if counters:
+        lines.append("")
+        lines.append(f"{'COUNTER':<28} {'VALUE':>6}")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name:<28} {value:>6}")
+
+    for cache in ("llm.cache", "pdf.page_cache"):
+        hits = counters.get(f"{cache}_hit", 0)
+        misses = counters.get(f"{cache}_miss", 0)
+        if hits + misses:
+            lines.append(f"{cache + ' hit rate':<28} {100 * hits / (hits + misses):>5.1f}%")
+    return "\n".join(lines)
+
+
+def write_trace(path=None):
+    path = path or TRACE_FILE
+    spans, counters = snapshot()
+    events = [
+        {
+            "name": s["name"],
+            "cat": s["cat"],
+            "ph": "X",
+            "ts": round(s["start"] * 1e6),
+            "dur": round(s["duration"] * 1e6),
+            "pid": os.getpid(),
+            "tid": s["tid"],
+            "args": s["args"],
+        }
+        for s in spans
+    ]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "counters": counters}, f, indent=1, default=str)
+    return path
+
+
+def finish_run(path=None):
+    print("\n📊 Run Profile:")
+    print(summary_table())
+    trace_path = write_trace(path)
+    print(f"   (trace written to '{trace_path}', open it in chrome://tracing or ui.perfetto.dev)")